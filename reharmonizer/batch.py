@@ -0,0 +1,283 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from .note import Note, Interval, MODES
+from .singable import Key, Parallel, AtChannel, Transpose, reharmonize, to_midi, to_lilypond
+from .cache import ReharmonizationCache, default_cache
+from .instruments.piano import acoustic_grand_piano
+
+
+# Reharmonizes a corpus of melodies on a process pool.
+#
+# Jobs are read from a json lines file, one melody per line:
+#     {"name": "twinkle", "scale": {"mode": "major", "tonic": "C5"}, "melody": [[start, length, "C5" or null], ...]}
+# Every finished job is appended to <output>/done.jsonl after its files are written, so an interrupted
+# run started again with the same output directory only solves the jobs that are missing. Jobs that
+# fail, including those whose scale cannot be built, are recorded with their error and retried by the
+# next run. `python -m reharmonizer.batch --self-test` runs the module's tests.
+
+
+MANIFEST = 'done.jsonl'
+
+
+def _check_name(name):
+    # names become file names in the output directory, so they may not leave it or name it
+    if not isinstance(name, str) or name in ('', '.', '..') or '/' in name or '\\' in name or '\0' in name:
+        raise ValueError('Invalid job name {!r}'.format(name))
+
+
+def read_jobs(path):
+    jobs = []
+    names = set()
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            try:
+                _check_name(job.get('name'))
+                if job['name'] in names:
+                    raise ValueError('Duplicate job name {!r}'.format(job['name']))
+            except ValueError as e:
+                raise ValueError('{}:{}: {}'.format(path, number, e))
+            names.add(job['name'])
+            jobs.append(job)
+    return jobs
+
+
+def job_scale(job):
+    scale = job['scale']
+    return MODES[scale.get('mode', 'major')](tonic=Note(scale['tonic']))
+
+
+def job_scale_key(job):
+    # (mode, tonic) shared by the worker warm-up, checked by building the scale
+    job_scale(job)
+    return job['scale'].get('mode', 'major'), job['scale']['tonic']
+
+
+def job_melody(job):
+    return Parallel()([
+        Key(start=start, length=length, note=None if note is None else Note(note)) for start, length, note in job['melody']
+    ])
+
+
+def _warm(scales):
+    # scale tables live on the scale classes; filling them before the pool forks shares them with every
+    # worker, and under spawn the initializer fills them once per worker instead of once per job
+    for mode, tonic in scales:
+        scale = MODES[mode](tonic=Note(tonic))
+        scale.vocabulary()
+        scale.transition_matrix()
+        for number in scale.possible_numbers():
+            scale.chord(number)
+            scale.pitch_class_masks(number)
+
+
+_worker = {}
+
+
+def _init_worker(scales, options):
+    _warm(scales)
+    _worker.update(options)
+    if options['cache_directory']:
+        _worker['cache'] = ReharmonizationCache(directory=options['cache_directory'])
+    else:
+        _worker['cache'] = default_cache
+
+
+def _write(path, write):
+    # written to a temporary file first so that an interrupted job never leaves a truncated output behind
+    temp = path + '.tmp'
+    write(temp)
+    os.replace(temp, path)
+
+
+def _run_job(job):
+    try:
+        scale = job_scale(job)
+        melody = job_melody(job)
+        progression, chords = reharmonize(
+            melody, scale, granularity=_worker['granularity'], return_chord=True, cache=_worker['cache'])
+        song = Parallel()([AtChannel(0)(melody), AtChannel(1)(Transpose(Interval('-P8'))(progression))])
+
+        base = os.path.join(_worker['output'], job['name'])
+        if 'midi' in _worker['formats']:
+            mid = to_midi(song, instruments={ 0: acoustic_grand_piano, 1: acoustic_grand_piano })
+            _write(base + '.mid', mid.save)
+        if 'lilypond' in _worker['formats']:
+            text = to_lilypond(song, chords=chords, clefs={ 1: 'bass' })
+
+            def save(path):
+                with open(path, 'w') as f:
+                    f.write(text)
+            _write(base + '.ly', save)
+        return { 'name': job['name'], 'chords': len(chords) }
+    except Exception as e:
+        return _error_record(job, e)
+
+
+def _error_record(job, e):
+    return { 'name': job['name'], 'error': '{}: {}'.format(type(e).__name__, e) }
+
+
+def finished_jobs(output):
+    path = os.path.join(output, MANIFEST)
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path) as f:
+        for line in f:
+            # the last line may be cut short if the run was killed while appending it
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if 'error' not in record:
+                done.add(record['name'])
+    return done
+
+
+def run(jobs, output, workers=None, chunksize=8, granularity=(1, 2, 4), formats=('midi', 'lilypond'),
+        cache_directory=None, log=sys.stderr, report_every=5):
+    os.makedirs(output, exist_ok=True)
+    done = finished_jobs(output)
+    pending = [job for job in jobs if job['name'] not in done]
+
+    # a job whose scale cannot be built fails on its own instead of stopping the batch
+    scales = set()
+    runnable = []
+    invalid = []
+    for job in pending:
+        try:
+            scales.add(job_scale_key(job))
+            runnable.append(job)
+        except Exception as e:
+            invalid.append(_error_record(job, e))
+    scales = sorted(scales)
+    options = {
+        'output': output, 'granularity': tuple(granularity), 'formats': tuple(formats), 'cache_directory': cache_directory,
+    }
+    _warm(scales)
+
+    stats = { 'skipped': len(jobs) - len(pending), 'done': 0, 'failed': 0, 'seconds': 0.0 }
+    begin = last_report = time.perf_counter()
+    with Pool(workers, initializer=_init_worker, initargs=(scales, options)) as pool, \
+         open(os.path.join(output, MANIFEST), 'a') as manifest:
+        for record in itertools.chain(invalid, pool.imap_unordered(_run_job, runnable, chunksize)):
+            manifest.write(json.dumps(record) + '\n')
+            manifest.flush()
+            if 'error' in record:
+                stats['failed'] += 1
+                if log is not None:
+                    print('failed {}: {}'.format(record['name'], record['error']), file=log)
+            else:
+                stats['done'] += 1
+
+            now = time.perf_counter()
+            if log is not None and now - last_report >= report_every:
+                last_report = now
+                finished = stats['done'] + stats['failed']
+                print('{}/{} songs, {:.1f} songs/s'.format(finished, len(pending), finished / (now - begin)), file=log)
+
+    stats['seconds'] = time.perf_counter() - begin
+    stats['songs_per_second'] = (stats['done'] + stats['failed']) / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m reharmonizer.batch', description='Reharmonize a corpus of melodies.')
+    parser.add_argument('jobs', help='json lines file with one {"name", "scale", "melody"} job per line')
+    parser.add_argument('-o', '--output', default='reharmonized', help='output directory, also used to resume')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='worker processes (default: cpu count)')
+    parser.add_argument('--chunksize', type=int, default=8, help='jobs handed to a worker at a time')
+    parser.add_argument('--granularity', type=float, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--format', dest='formats', nargs='+', choices=['midi', 'lilypond'], default=['midi', 'lilypond'])
+    parser.add_argument('--cache-dir', default=None, help='directory of the reharmonization cache shared by workers')
+    args = parser.parse_args(argv)
+
+    granularity = [int(g) if g == int(g) else g for g in args.granularity]
+    try:
+        jobs = read_jobs(args.jobs)
+    except ValueError as e:
+        parser.error(str(e))
+    stats = run(
+        jobs, args.output, workers=args.workers, chunksize=args.chunksize,
+        granularity=granularity, formats=args.formats, cache_directory=args.cache_dir,
+    )
+    print('{done} done, {failed} failed, {skipped} already done; {seconds:.1f}s, {songs_per_second:.1f} songs/s'.format(**stats))
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__' and sys.argv[1:] == ['--self-test']:
+    import tempfile
+    import unittest
+
+    def _job(name, notes, tonic='C5'):
+        return { 'name': name, 'scale': { 'mode': 'major', 'tonic': tonic }, 'melody': [[i, 1, n] for i, n in enumerate(notes)] }
+
+    class TestBatch(unittest.TestCase):
+
+        def test_read_jobs(self):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'jobs.jsonl')
+                for name in ['../escape', 'a/b', '..', '', None, 'c\\d']:
+                    with open(path, 'w') as f:
+                        f.write(json.dumps(_job('fine', ['C5'])) + '\n\n' + json.dumps(_job(name, ['C5'])) + '\n')
+                    with self.assertRaises(ValueError):
+                        read_jobs(path)
+                with open(path, 'w') as f:
+                    f.write(json.dumps(_job('twinkle', ['C5'])) + '\n' + json.dumps(_job('twinkle', ['D5'])) + '\n')
+                with self.assertRaises(ValueError):
+                    read_jobs(path)
+
+        def test_resume(self):
+            jobs = [
+                _job('one', ['C5', 'E5', 'G5', 'C5']),
+                _job('two', ['A4', None, 'E5', 'A4'], tonic='A4'),
+                _job('three', ['G5', 'F5', 'E5', 'D5']),
+            ]
+            with tempfile.TemporaryDirectory() as directory:
+                output = os.path.join(directory, 'out')
+                stats = run(jobs[:2], output, workers=1, granularity=(1, 2), log=None)
+                self.assertEqual((stats['done'], stats['failed'], stats['skipped']), (2, 0, 0))
+                self.assertEqual(finished_jobs(output), { 'one', 'two' })
+                written = os.path.getmtime(os.path.join(output, 'one.mid'))
+
+                stats = run(jobs, output, workers=1, granularity=(1, 2), log=None)
+                self.assertEqual((stats['done'], stats['failed'], stats['skipped']), (1, 0, 2))
+                self.assertEqual(finished_jobs(output), { 'one', 'two', 'three' })
+                self.assertEqual(os.path.getmtime(os.path.join(output, 'one.mid')), written)
+                self.assertEqual(
+                    sorted(os.listdir(output)),
+                    sorted([MANIFEST] + [job['name'] + ext for job in jobs for ext in ('.mid', '.ly')]))
+
+        def test_invalid_scale(self):
+            unknown = _job('unknown', ['C5', 'D5'])
+            unknown['scale']['mode'] = 'bogus'
+            untuned = _job('untuned', ['C5', 'D5'])
+            del untuned['scale']['tonic']
+            jobs = [_job('fine', ['C5', 'E5', 'G5', 'C5']), unknown, untuned]
+            with tempfile.TemporaryDirectory() as directory:
+                output = os.path.join(directory, 'out')
+                stats = run(jobs, output, workers=1, granularity=(1, 2), formats=('midi',), log=None)
+                self.assertEqual((stats['done'], stats['failed']), (1, 2))
+                with open(os.path.join(output, MANIFEST)) as f:
+                    records = { r['name']: r for r in map(json.loads, f) }
+                self.assertTrue(records['unknown']['error'].startswith('KeyError'))
+                self.assertTrue(records['untuned']['error'].startswith('KeyError'))
+                self.assertEqual(finished_jobs(output), { 'fine' })
+
+                # failed jobs are tried again
+                stats = run(jobs, output, workers=1, granularity=(1, 2), formats=('midi',), log=None)
+                self.assertEqual((stats['done'], stats['failed'], stats['skipped']), (0, 2, 1))
+
+    unittest.main(argv=sys.argv[:1])
+
+elif __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+
+# bump when the reharmonizer's output for the same input may change
+CACHE_VERSION = 3
+
+
+def _canonical(value):
+    # floats are written with repr so that keys round-trip exactly
+    if isinstance(value, float):
+        return repr(value)
+    elif isinstance(value, dict):
+        return [[_canonical(k), _canonical(v)] for k, v in sorted(value.items(), key=lambda item: repr(item[0]))]
+    elif isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def content_key(*parts):
+    data = json.dumps(_canonical([CACHE_VERSION, *parts]), separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def relative_melody_fingerprint(melody, tonic):
+    # scoring only looks at pitch classes, so the melody is keyed by pitch class relative to the tonic;
+    # the same tune in any key or octave maps to the same fingerprint
+    tonic = tonic.midi_number()
+    return sorted([(k.start, k.length, -1 if k.note is None else (k.note.midi_number() - tonic) % 12) for k in melody])
+
+
+def mode_fingerprint(scale):
+    # keyed by the scale's tables rather than its class name, so that two modes built under the same name
+    # never share entries and editing a table invalidates them; chords are included as pitch classes
+    # relative to the tonic to cover scales that override diatonic()
+    tonic = scale.tonic.midi_number()
+    return {
+        'intervals': [str(i) for i in scale.intervals],
+        'numbers': list(scale.numbers),
+        'cadences': list(scale.cadences),
+        'transitions': scale.transitions,
+        'tension_intervals_primary': scale.tension_intervals_primary,
+        'tension_intervals_secondary': scale.tension_intervals_secondary,
+        'chords': { number: [(n.midi_number() - tonic) % 12 for n in scale.chord(number)] for number in scale.possible_numbers() },
+    }
+
+
+class ReharmonizationCache:
+    # LRU of solved progressions keyed by content hash, optionally backed by one json file per key
+    def __init__(self, maxsize=256, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        if self.directory and os.path.exists(self._path(key)):
+            with open(self._path(key)) as f:
+                value = json.load(f)
+            self._remember(key, value)
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            temp = self._path(key) + '.tmp'
+            with open(temp, 'w') as f:
+                json.dump(value, f)
+            os.replace(temp, self._path(key))
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return { 'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'maxsize': self.maxsize }
+
+
+# shared by reharmonize() and Reharmonize nodes unless another cache is passed
+default_cache = ReharmonizationCache()
@@ -0,0 +1,558 @@
+import copy
+import numpy as np
+
+from .note import Interval
+from .singable import (
+    Singable, Key, EventBuffer, _KeyMap, _Parallel, _Enumerate, _Repeat,
+    _ShiftTime, _Amplify, _Transpose, _AtChannel, _AtNote, _Bound, _child_singables,
+)
+from .reharmonize import _expand_ranges
+
+
+# compile_plan(singable) walks a graph once and flattens it into a Plan: the leaves of the graph (keys,
+# buffers and any node without a structural rule, rendered as a whole) and, for every place a leaf
+# appears in the output, one composed transform. Parallel, Enumerate and Repeat only decide where a
+# leaf lands in time, so they disappear into the transforms; runs of ShiftTime, Amplify, Transpose,
+# AtChannel and AtNote fold into a single affine step, and the remaining per-key operators (Swing,
+# Bound, Lengthen, Longify) stay as vectorized steps between them. An affine step keeps its shifts and
+# gains in order and applies them one at a time, so starts and velocities round exactly as in sing()
+# even for values such as 0.1. Rendering a plan costs the same per event whatever the depth of the
+# graph, and a plan can be rendered any number of times; keys are read again on every render. Where Enumerate and Repeat place children one after another, the
+# offsets depend on the children's extents; a plan remembers the leaf timings they were measured from
+# and compiles its graph again when a render finds them changed (e.g. after key.length = 2).
+
+
+class Affine:
+    # start + each of shifts, velocity * each of gains, note replaced by `note` if set, then moved by
+    # (dstep, dmidi), channel replaced by `channel` if set; rests are never transposed
+    __slots__ = ('shifts', 'gains', 'dstep', 'dmidi', 'channel', 'note')
+
+    def __init__(self, shifts=(), gains=(), dstep=0, dmidi=0, channel=None, note=None):
+        self.shifts = shifts
+        self.gains = gains
+        self.dstep = dstep
+        self.dmidi = dmidi
+        self.channel = channel
+        self.note = note
+
+    @staticmethod
+    def of(node):
+        if isinstance(node, _ShiftTime):
+            return Affine(shifts=(node.time,))
+        elif isinstance(node, _Amplify):
+            return Affine(gains=(node.magnitude,))
+        elif isinstance(node, _Transpose):
+            sign = -1 if node.transpose.inverted else 1
+            return Affine(dstep=sign * (node.transpose.number - 1), dmidi=sign * node.transpose.get_semitones())
+        elif isinstance(node, _AtChannel):
+            return Affine(channel=node.channel)
+        elif isinstance(node, _AtNote):
+            return Affine(note=node.note)
+        return None
+
+    def then(self, other):
+        # self followed by other
+        if other.note is not None:
+            note, dstep, dmidi = other.note, other.dstep, other.dmidi
+        else:
+            note, dstep, dmidi = self.note, self.dstep + other.dstep, self.dmidi + other.dmidi
+        return Affine(
+            shifts=self.shifts + other.shifts, gains=self.gains + other.gains, dstep=dstep, dmidi=dmidi,
+            channel=self.channel if other.channel is None else other.channel, note=note,
+        )
+
+    def is_identity(self):
+        return not self.shifts and not self.gains and self.dstep == 0 and self.dmidi == 0 and \
+            self.channel is None and self.note is None
+
+
+_IDENTITY = Affine()
+
+
+class _Entry:
+    # one appearance of a leaf: affines[0], ops[0], affines[1], ..., affines[-1] applied in order
+    __slots__ = ('leaf', 'affines', 'ops')
+
+    def __init__(self, leaf, affines, ops):
+        self.leaf = leaf
+        self.affines = affines
+        self.ops = ops
+
+    def then(self, node):
+        affine = Affine.of(node)
+        if affine is not None:
+            return _Entry(self.leaf, self.affines[:-1] + (self.affines[-1].then(affine),), self.ops)
+        return _Entry(self.leaf, self.affines + (_IDENTITY,), self.ops + (node,))
+
+
+def _apply_affine(buffer, columns, owner):
+    shifts, gains, dstep, dmidi, channel, has_note, note_step, note_midi = [c[owner] for c in columns]
+    # one column per shift and gain, padded with exact identities, applied in the order sing() would
+    start = buffer.start
+    for shift in shifts.T:
+        start = start + shift
+    velocity = buffer.velocity
+    for gain in gains.T:
+        velocity = velocity * gain
+    rest = np.where(has_note, False, buffer.rest)
+    step = np.where(has_note, note_step, buffer.step)
+    midi = np.where(has_note, note_midi, buffer.midi)
+    return buffer.replace(
+        start=start,
+        velocity=velocity,
+        step=np.where(rest, step, step + dstep),
+        midi=np.where(rest, midi, midi + dmidi),
+        rest=rest,
+        channel=np.where(channel >= 0, channel, buffer.channel),
+    )
+
+
+def _padded(rows, fill):
+    width = max(len(row) for row in rows)
+    return np.array([tuple(row) + (fill,) * (width - len(row)) for row in rows], dtype=float).reshape(len(rows), width)
+
+
+class _Group:
+    # entries sharing the same non-affine operators, evaluated together with per-entry affine columns
+    def __init__(self, ops, entries, orders):
+        self.ops = ops
+        self.leaves = np.array([e.leaf for e in entries], dtype=np.int64)
+        self.orders = np.array(orders, dtype=np.int64)
+        self.columns = []
+        for i in range(len(ops) + 1):
+            affines = [e.affines[i] for e in entries]
+            if all(a.is_identity() for a in affines):
+                self.columns.append(None)
+                continue
+            self.columns.append((
+                _padded([a.shifts for a in affines], 0.0),
+                _padded([a.gains for a in affines], 1.0),
+                np.array([a.dstep for a in affines], dtype=np.int64),
+                np.array([a.dmidi for a in affines], dtype=np.int64),
+                np.array([-1 if a.channel is None else a.channel for a in affines], dtype=np.int64),
+                np.array([a.note is not None for a in affines], dtype=bool),
+                np.array([0 if a.note is None else a.note.step for a in affines], dtype=np.int64),
+                np.array([0 if a.note is None else a.note.midi for a in affines], dtype=np.int64),
+            ))
+
+    def evaluate(self, base, first, count):
+        rows, owner = _expand_ranges(first[self.leaves], first[self.leaves] + count[self.leaves])
+        buffer = base.take(rows)
+        for i, columns in enumerate(self.columns):
+            if columns is not None:
+                buffer = _apply_affine(buffer, columns, owner)
+            if i < len(self.ops):
+                buffer = self.ops[i].apply(buffer)
+        return buffer, self.orders[owner]
+
+
+class Plan(Singable):
+    def __init__(self, leaves, entries, graph=None):
+        self.leaves = leaves
+        self.entries = entries
+        self.graph = graph
+        # start and length of every leaf row when extents were measured, None if no offset depends on them
+        self.timings = None
+        self.keys = [i for i, leaf in enumerate(leaves) if isinstance(leaf, Key)]
+        self.others = [i for i, leaf in enumerate(leaves) if not isinstance(leaf, Key)]
+
+        groups = {}
+        for order, entry in enumerate(entries):
+            groups.setdefault(tuple(id(op) for op in entry.ops), (entry.ops, [], []))
+            _, members, orders = groups[tuple(id(op) for op in entry.ops)]
+            members.append(entry)
+            orders.append(order)
+        self.groups = [_Group(ops, members, orders) for ops, members, orders in groups.values()]
+
+    def _leaf_buffers(self, rendered=None):
+        # every leaf rendered once into one buffer, with the first row and row count of each leaf
+        others = []
+        for i in self.others:
+            if rendered is not None and i in rendered:
+                others.append(rendered[i])
+            else:
+                others.append(self.leaves[i].render())
+                if rendered is not None:
+                    rendered[i] = others[-1]
+        buffers = [EventBuffer.from_keys([self.leaves[i] for i in self.keys])] + others
+        count = np.zeros(len(self.leaves), dtype=np.int64)
+        count[self.keys] = 1
+        count[self.others] = [len(b) for b in others]
+        first = np.zeros(len(self.leaves), dtype=np.int64)
+        first[self.keys] = np.arange(len(self.keys))
+        first[self.others] = len(self.keys) + np.cumsum([0] + [len(b) for b in others])[:len(others)]
+        return EventBuffer.concatenate(buffers), first, count
+
+    def render(self, rendered=None):
+        if not self.entries:
+            return EventBuffer.from_keys([])
+        base, first, count = self._leaf_buffers(rendered)
+        if self.timings is not None and not _same_timings(self.timings, base):
+            self.__dict__.update(compile_plan(self.graph).__dict__)
+            base, first, count = self._leaf_buffers()
+        buffers, orders = zip(*[group.evaluate(base, first, count) for group in self.groups])
+        # rows come back grouped; a stable sort by entry restores the order sing() yields in
+        return EventBuffer.concatenate(buffers).take(np.argsort(np.concatenate(orders), kind='stable'))
+
+    def sing(self):
+        return self.render().sing()
+
+
+def _same_timings(timings, buffer):
+    start, length = timings
+    return np.array_equal(start, buffer.start) and np.array_equal(length, buffer.length)
+
+
+class _Compiler:
+    def __init__(self):
+        self.leaves = []
+        self.leaf_index = {}
+        # leaves without a structural rule, rendered while measuring extents
+        self.rendered = {}
+        self.measured = False
+
+    def leaf(self, node):
+        if id(node) not in self.leaf_index:
+            self.leaf_index[id(node)] = len(self.leaves)
+            self.leaves.append(node)
+        return _Entry(self.leaf_index[id(node)], (_IDENTITY,), ())
+
+    def evaluate(self, entries):
+        # the keys the entries stand for, evaluated over just the leaves they use
+        self.measured = True
+        used = sorted({ e.leaf for e in entries })
+        index = { leaf: i for i, leaf in enumerate(used) }
+        plan = Plan([self.leaves[leaf] for leaf in used], [_Entry(index[e.leaf], e.affines, e.ops) for e in entries])
+        rendered = { index[leaf]: buffer for leaf, buffer in self.rendered.items() if leaf in index }
+        buffer = plan.render(rendered)
+        self.rendered.update({ used[i]: b for i, b in rendered.items() })
+        return buffer
+
+    def shifted(self, entries, time):
+        shift = _ShiftTime(None, time)
+        return [e.then(shift) for e in entries]
+
+    def visit(self, node):
+        if isinstance(node, _KeyMap):
+            source, nodes = node.chain()
+            entries = self.visit(source)
+            for n in nodes:
+                entries = [e.then(n) for e in entries]
+            return entries
+
+        elif isinstance(node, _Parallel):
+            return [e for c in node.children for e in self.visit(c)]
+
+        elif isinstance(node, _Enumerate):
+            entries = []
+            time = 0
+            for cl in node.children:
+                time_max = 0
+                if not isinstance(cl, (list, tuple)):
+                    cl = [cl]
+                for c in cl:
+                    child = self.visit(c)
+                    if child and not node.interval:
+                        buffer = self.evaluate(child)
+                        if len(buffer):
+                            time_max = max(float((buffer.start + time + buffer.length).max()), time_max)
+                    entries += self.shifted(child, time)
+                if node.interval:
+                    time += node.interval
+                else:
+                    time = time_max
+            return entries
+
+        elif isinstance(node, _Repeat):
+            child = self.visit(node.child)
+            buffer = self.evaluate(child) if child and not node.interval else None
+            entries = []
+            time = 0
+            time_max = 0
+            for _ in range(node.repeat_num):
+                entries += self.shifted(child, time)
+                if buffer is not None and len(buffer):
+                    time_max = max(float((buffer.start + time + buffer.length).max()), time_max)
+                if node.interval:
+                    time += node.interval
+                else:
+                    time = time_max
+            return entries
+
+        return [self.leaf(node)]
+
+
+def compile_plan(singable):
+    compiler = _Compiler()
+    plan = Plan(compiler.leaves, compiler.visit(singable), singable)
+    if compiler.measured:
+        base, _, _ = plan._leaf_buffers(dict(compiler.rendered))
+        plan.timings = (base.start, base.length)
+    return plan
+
+
+# optimize(singable) rewrites a graph into an equivalent smaller one before it is rendered or compiled:
+#   - within a run of per-key operators, ShiftTime, Transpose, Amplify and AtChannel touch separate fields
+#     and commute, so each kind merges into one node (shifts add, transpositions add, gains multiply, the
+#     outermost channel wins) and identities (ShiftTime(0), Transpose by a unison, Amplify(1)) disappear
+#   - operators that leave times alone (Transpose, Amplify, AtChannel, AtNote, Bound) move below Repeat,
+#     so that they run on the repeated phrase once instead of on every repetition
+#   - Repeat of Repeat without intervals becomes one Repeat, Repeat(1) and single-child Parallel and
+#     Enumerate disappear, and nested Parallels are flattened
+# Shifts and gains are summed and multiplied in a different order than sing() would apply them, so the
+# result is exact for binary fractions such as 1/2 or 3/4 and equal up to rounding otherwise.
+
+_MERGEABLE = (_ShiftTime, _Transpose, _Amplify, _AtChannel)
+_TIME_NEUTRAL = (_Transpose, _Amplify, _AtChannel, _AtNote, _Bound)
+
+
+def _interval_steps(interval):
+    sign = -1 if interval.inverted else 1
+    return sign * (interval.number - 1), sign * interval.get_semitones()
+
+
+def _interval_of(dstep, dmidi):
+    # the interval moving a note by dstep diatonic steps and dmidi semitones, spelled like Note.__sub__
+    inverted = dstep < 0 or (dstep == 0 and dmidi < 0)
+    if inverted:
+        dstep, dmidi = -dstep, -dmidi
+    number = dstep + 1
+    return Interval(number=number, quality=Interval.get_quality(number, dstep * 2 - dmidi), inverted=inverted)
+
+
+def _build(source, nodes):
+    for node in nodes:
+        clone = copy.copy(node)
+        clone.child = source
+        source = clone
+    return source
+
+
+def _merge_segment(nodes):
+    # one run of commuting operators, innermost first, merged into at most one node of each kind
+    shift, gain, dstep, dmidi, channel = 0, 1, 0, 0, None
+    transposes = []
+    for node in nodes:
+        if isinstance(node, _ShiftTime):
+            shift += node.time
+        elif isinstance(node, _Amplify):
+            gain *= node.magnitude
+        elif isinstance(node, _Transpose):
+            step, midi = _interval_steps(node.transpose)
+            dstep, dmidi = dstep + step, dmidi + midi
+            transposes.append(node)
+        elif node.channel is not None:
+            channel = node.channel
+
+    merged = []
+    if shift != 0:
+        merged.append(_ShiftTime(None, shift))
+    if dstep != 0 or dmidi != 0:
+        try:
+            merged.append(_Transpose(None, _interval_of(dstep, dmidi)))
+        except KeyError:
+            # no single interval spells the sum (e.g. beyond doubly augmented); keep the transpositions
+            merged += transposes
+    if gain != 1:
+        merged.append(_Amplify(None, gain))
+    if channel is not None:
+        merged.append(_AtChannel(None, channel))
+    return merged
+
+
+def _merge_run(nodes):
+    merged, segment = [], []
+    for node in nodes:
+        if isinstance(node, _MERGEABLE):
+            segment.append(node)
+        else:
+            merged += _merge_segment(segment) + [node]
+            segment = []
+    return merged + _merge_segment(segment)
+
+
+def _rewrite(node):
+    if isinstance(node, _KeyMap):
+        source, nodes = node.chain()
+        source = _rewrite(source)
+        nodes = _merge_run(nodes)
+        if isinstance(source, _Repeat):
+            pushed = 0
+            while pushed < len(nodes) and isinstance(nodes[pushed], _TIME_NEUTRAL):
+                pushed += 1
+            if pushed:
+                repeat = copy.copy(source)
+                repeat.child = _rewrite(_build(source.child, nodes[:pushed]))
+                source, nodes = repeat, nodes[pushed:]
+        return _build(source, nodes)
+
+    elif isinstance(node, _Parallel):
+        children = []
+        for c in node.children:
+            c = _rewrite(c)
+            children += c.children if isinstance(c, _Parallel) else [c]
+        return children[0] if len(children) == 1 else _Parallel(children)
+
+    elif isinstance(node, _Enumerate):
+        children = [[_rewrite(c) for c in cl] if isinstance(cl, (list, tuple)) else _rewrite(cl) for cl in node.children]
+        if len(children) == 1 and not isinstance(children[0], list):
+            return children[0]
+        return _Enumerate(children, node.interval)
+
+    elif isinstance(node, _Repeat):
+        child = _rewrite(node.child)
+        if node.repeat_num == 1:
+            return child
+        if isinstance(child, _Repeat) and not node.interval and not child.interval:
+            return _Repeat(child.child, node.repeat_num * child.repeat_num)
+        return _Repeat(child, node.repeat_num, node.interval)
+
+    elif isinstance(node, Singable) and not isinstance(node, (Key, EventBuffer)):
+        # any other node keeps its behaviour; only the singables it wraps are rewritten
+        attributes = [a for a in ('child', 'chord', 'pattern') if isinstance(getattr(node, a, None), Singable)]
+        if attributes:
+            node = copy.copy(node)
+            for a in attributes:
+                setattr(node, a, _rewrite(getattr(node, a)))
+    return node
+
+
+def count_nodes(singable):
+    # operator nodes in the graph, keys excluded
+    if isinstance(singable, (Key, EventBuffer)):
+        return 0
+    return 1 + sum(count_nodes(c) for c in _child_singables(singable))
+
+
+def _describe(node):
+    name = type(node).__name__.lstrip('_')
+    if isinstance(node, Key):
+        return 'Key({}, {}, {})'.format(node.start, node.length, node.note)
+    elif isinstance(node, EventBuffer):
+        return 'EventBuffer({} events)'.format(len(node))
+    elif isinstance(node, _Transpose):
+        return 'Transpose({}{})'.format('-' if node.transpose.inverted else '', node.transpose)
+    elif isinstance(node, _Repeat):
+        return 'Repeat({}{})'.format(node.repeat_num, '' if node.interval is None else ', interval={}'.format(node.interval))
+    parameters = { _ShiftTime: 'time', _Amplify: 'magnitude', _AtChannel: 'channel', _AtNote: 'note' }
+    for cls, attribute in parameters.items():
+        if isinstance(node, cls):
+            return '{}({})'.format(name, getattr(node, attribute))
+    if isinstance(node, _Bound):
+        return 'Bound({}, {})'.format(node.low, node.high)
+    return name
+
+
+def dump(singable, indent=0):
+    # one line per node; runs of plain keys are summarized
+    children = _child_singables(singable)
+    line = '  ' * indent + _describe(singable)
+    if children and all(isinstance(c, Key) for c in children):
+        return line + ' [{} keys]'.format(len(children))
+    return '\n'.join([line] + [dump(c, indent + 1) for c in children])
+
+
+def optimize(singable, log=None):
+    # returns the rewritten graph and the number of nodes eliminated; with a log (any file-like object)
+    # the graph is dumped before and after
+    optimized = _rewrite(singable)
+    eliminated = count_nodes(singable) - count_nodes(optimized)
+    if log is not None:
+        log.write('before:\n{}\nafter:\n{}\neliminated {} nodes\n'.format(dump(singable), dump(optimized), eliminated))
+    return optimized, eliminated
+
+
+if __name__ == '__main__':
+    import unittest
+    from .note import Note, Interval, MajorScale
+    from .singable import (
+        Parallel, Enumerate, Repeat, ShiftTime, Amplify, Transpose, AtChannel, AtNote, Swing, Bound,
+        SelectIndex, Harmonize, Reharmonize, _Repeat,
+    )
+
+    def _fields(keys):
+        return [(k.start, k.length, k.note, k.channel, k.velocity) for k in keys]
+
+    class TestCompile(unittest.TestCase):
+
+        def setUp(self):
+            self.melody = Enumerate()([
+                Key(length=length, note=None if note is None else Note(note), velocity=0.5)
+                for length, note in [(1, 'C5'), (1/2, 'E5'), (1/2, 'D5'), (2, 'G5'), (1, 'A4'), (1, 'F5'), (2, 'C5')]
+            ])
+
+        def test_matches_sing(self):
+            melody = self.melody
+            graphs = [
+                Amplify(0.5)(AtChannel(2)(Transpose(Interval('M3'))(ShiftTime(3)(Swing(1, 0.66)(Transpose(Interval('-P8'))(melody)))))),
+                Bound(Note('C4'), Note('C5'))(Transpose(Interval('P5'))(Repeat(3)(melody))),
+                Enumerate()([melody, [AtNote(Note('D4'))(melody), ShiftTime(1)(melody)], Repeat(2, interval=3)(melody)]),
+                Parallel()([AtChannel(0)(melody), AtChannel(1)(Transpose(Interval('-P8'))(Reharmonize(MajorScale(tonic=Note('C5')))(melody)))]),
+                Repeat(2)(SelectIndex(1, 3, Amplify(0.25))(Harmonize(Interval('M3'))(melody))),
+            ]
+            for graph in graphs:
+                self.assertEqual(_fields(compile_plan(graph).sing()), _fields(graph.sing()))
+
+        def test_interval_of(self):
+            for notation in ['P1', 'M3', '-m3', 'A4', '-d5', 'P8', '-P15', 'M9', '-m2', 'A1', '-A1']:
+                interval = Interval(notation)
+                merged = _interval_of(*_interval_steps(interval))
+                self.assertEqual((merged.number, merged.quality, merged.inverted), (interval.number, interval.quality, interval.inverted))
+
+        def test_optimize(self):
+            import io
+            melody = self.melody
+            graph = Parallel()([
+                AtChannel(1)(AtChannel(0)(Transpose(Interval('M3'))(Amplify(1)(Transpose(Interval('-P8'))(
+                    Repeat(4)(Repeat(2)(Enumerate()([melody])))))))),
+                ShiftTime(1/2)(Amplify(0.5)(ShiftTime(1/4)(Swing(1, 0.66)(ShiftTime(0)(melody))))),
+            ])
+            log = io.StringIO()
+            optimized, eliminated = optimize(graph, log=log)
+            self.assertEqual(_fields(optimized.sing()), _fields(graph.sing()))
+            self.assertEqual(_fields(compile_plan(optimized).sing()), _fields(graph.sing()))
+            self.assertEqual(eliminated, count_nodes(graph) - count_nodes(optimized))
+            self.assertEqual(eliminated, 7)
+            self.assertIn('eliminated 7 nodes', log.getvalue())
+
+            # the transposition and channel now apply below the repeat, merged into one node each
+            repeat = optimized.children[0]
+            self.assertIsInstance(repeat, _Repeat)
+            self.assertEqual(repeat.repeat_num, 8)
+            self.assertEqual(repeat.child.channel, 1)
+            self.assertEqual(str(repeat.child.child.transpose), 'm6')
+            self.assertTrue(repeat.child.child.transpose.inverted)
+
+        def test_reuse(self):
+            key = Key(length=1, note=Note('C5'))
+            graph = Repeat(2)(Transpose(Interval('M2'))(Enumerate()([key, Key(length=1, note=Note('E5'))])))
+            plan = compile_plan(graph)
+            self.assertEqual(_fields(plan.sing()), _fields(graph.sing()))
+            key.velocity = 0.25
+            self.assertEqual(_fields(plan.sing()), _fields(graph.sing()))
+
+        def test_rounding(self):
+            # shifts and gains that are not binary fractions round exactly as sing() rounds them
+            melody = Enumerate()([Key(length=0.1 * (i % 3 + 1), note=Note('C5'), velocity=0.3) for i in range(12)])
+            graphs = [
+                ShiftTime(0.1)(Amplify(0.1)(ShiftTime(0.1)(Amplify(0.1)(ShiftTime(0.1)(melody))))),
+                ShiftTime(0.1)(Amplify(0.3)(ShiftTime(0.2)(Amplify(0.7)(Repeat(3)(ShiftTime(0.3)(melody)))))),
+                Enumerate()([ShiftTime(0.1)(melody), Amplify(1.1)(Repeat(2, interval=0.7)(melody)), Parallel()([ShiftTime(0.3)(melody), melody])]),
+            ]
+            for graph in graphs:
+                self.assertEqual(_fields(compile_plan(graph).sing()), _fields(graph.sing()))
+
+        def test_changed_extents(self):
+            key = Key(length=1, note=Note('C5'))
+            graphs = [
+                Enumerate()([key, Key(length=1, note=Note('E5'))]),
+                Repeat(2)(Transpose(Interval('M2'))(key)),
+                Repeat(2, interval=3)(Enumerate()([key, Key(length=1, note=Note('E5'))])),
+            ]
+            plans = [compile_plan(graph) for graph in graphs]
+            key.length = 2
+            for plan, graph in zip(plans, graphs):
+                self.assertEqual(_fields(plan.sing()), _fields(graph.sing()))
+            self.assertEqual([(k.start, k.length) for k in plans[1].sing()], [(0, 2), (2, 2)])
+
+    unittest.main()
@@ -1,49 +1,92 @@
 import re
 
+_ORDER_PERFECT = ('dd', 'd', 'P', 'A', 'AA')
+_ORDER_MAJOR = ('dd', 'd', 'm', 'M', 'A', 'AA')
+
+_NUMBER_SEMITONES = { 1: 0, 2: 2, 3: 4, 4: 5, 5: 7, 6: 9, 7: 11 }
+
+# semitones of a simple interval, keyed by (number, quality)
+_SEMITONES_TABLE = {
+    (number, quality): _NUMBER_SEMITONES[number] + shift
+    for number in range(1, 8)
+    for quality, shift in (
+        zip(_ORDER_PERFECT, range(-2, 3)) if number in (1, 4, 5) else zip(_ORDER_MAJOR, range(-3, 3))
+    )
+}
+
+# quality of a simple interval, keyed by number and then by halves
+_QUALITY_TABLE = {
+    1: { h: q for q, h in zip(reversed(_ORDER_PERFECT), range(-2, 3)) },
+    2: { h: q for q, h in zip(reversed(_ORDER_MAJOR), range(-2, 4)) },
+    3: { h: q for q, h in zip(reversed(_ORDER_MAJOR), range(-2, 4)) },
+    4: { h: q for q, h in zip(reversed(_ORDER_PERFECT), range(-1, 4)) },
+    5: { h: q for q, h in zip(reversed(_ORDER_PERFECT), range(-1, 4)) },
+    6: { h: q for q, h in zip(reversed(_ORDER_MAJOR), range(-1, 5)) },
+    7: { h: q for q, h in zip(reversed(_ORDER_MAJOR), range(-1, 5)) },
+}
+
+_INTERVAL_NOTATION = re.compile(r'(-)?(M|m|A|AA|d|dd|P)(\d+)')
+
+_interval_pool = {}
+_interval_notation_cache = {}
+
+
 class Interval:
-    def __init__(self, notation=None, number=None, quality=None, inverted=False):
+    # Intervals are interned and immutable: constructing the same interval twice
+    # returns the same object, so they are cheap to build inside hot loops.
+    __slots__ = ('number', 'quality', 'inverted')
+
+    def __new__(cls, notation=None, number=None, quality=None, inverted=False):
         if notation:
+            cached = _interval_notation_cache.get(notation)
+            if cached is not None:
+                return cached
             # TODO: add notation syntax check
-            inverted, quality, number = re.match(r'(-)?(M|m|A|AA|d|dd|P)(\d+)', notation).groups()
+            inverted, quality, number = _INTERVAL_NOTATION.match(notation).groups()
             number = int(number)
-            inverted = True if inverted else False
-        
-        self.number = number
-        self.quality = quality
-        self.inverted = inverted
+
+        inverted = True if inverted else False
+        key = (number, quality, inverted)
+        interval = _interval_pool.get(key)
+        if interval is None:
+            interval = object.__new__(cls)
+            object.__setattr__(interval, 'number', number)
+            object.__setattr__(interval, 'quality', quality)
+            object.__setattr__(interval, 'inverted', inverted)
+            _interval_pool[key] = interval
+
+        if notation:
+            _interval_notation_cache[notation] = interval
+        return interval
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Interval is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Interval is immutable')
+
+    def __reduce__(self):
+        return (Interval, (None, self.number, self.quality, self.inverted))
 
     def is_potentially_perfect(self):
         corrected_number = ((self.number - 1) % 7) + 1
         return corrected_number == 1 or corrected_number == 4 or corrected_number == 5 or corrected_number == 8
 
     def augment(self):
-        if self.is_potentially_perfect():
-            order_perfect = ['dd', 'd', 'P', 'A', 'AA']
-            # TODO: add out of range exception
-            return Interval(number=self.number, quality=order_perfect[order_perfect.index(self.quality) + 1], inverted=self.inverted)
-        else:
-            order_major = ['dd', 'd', 'm', 'M', 'A', 'AA']
-            # TODO: add out of range exception
-            return Interval(number=self.number, quality=order_major[order_major.index(self.quality) + 1], inverted=self.inverted)
+        order = _ORDER_PERFECT if self.is_potentially_perfect() else _ORDER_MAJOR
+        # TODO: add out of range exception
+        return Interval(number=self.number, quality=order[order.index(self.quality) + 1], inverted=self.inverted)
 
     def diminish(self):
-        if self.is_potentially_perfect():
-            order_perfect = ['dd', 'd', 'P', 'A', 'AA']
-            # TODO: add out of range exception
-            return Interval(number=self.number, quality=order_perfect[order_perfect.index(self.quality) - 1], inverted=self.inverted)
-        else:
-            order_major = ['dd', 'd', 'm', 'M', 'A', 'AA']
-            # TODO: add out of range exception
-            return Interval(number=self.number, quality=order_major[order_major.index(self.quality) - 1], inverted=self.inverted)
+        order = _ORDER_PERFECT if self.is_potentially_perfect() else _ORDER_MAJOR
+        # TODO: add out of range exception
+        return Interval(number=self.number, quality=order[order.index(self.quality) - 1], inverted=self.inverted)
     
     def fundamental(self):
-        number = self.number
-        while number > 7:
-            number -= 7
-        return Interval(number=number, quality=self.quality, inverted=self.inverted)
+        return Interval(number=((self.number - 1) % 7) + 1, quality=self.quality, inverted=self.inverted)
 
     def invert(self):
-        return Interval(number=self.number, quality=self.quality, inverted=~self.inverted)
+        return Interval(number=self.number, quality=self.quality, inverted=not self.inverted)
 
     def __str__(self):
         return self.quality + str(self.number)
@@ -51,67 +94,96 @@ class Interval:
     def __eq__(self, other):
         return self.get_semitones() == other.get_semitones()
 
+    def __hash__(self):
+        return hash(self.get_semitones())
+
     def __neg__(self):
         return self.invert()
 
     def get_semitones(self):
-        number = self.number
-        semitones = 0
-        while number > 7:
-            number -= 7
-            semitones += 12
-
-        semitones += { 1: 0, 2: 2, 3: 4, 4: 5, 5: 7, 6: 9, 7: 11 }[number]
-
-        order_perfect = ['dd', 'd', 'P', 'A', 'AA']
-        order_major = ['dd', 'd', 'm', 'M', 'A', 'AA']
-        semitones_map = {
-            1: { q: s for q, s in zip(order_perfect, range(-2, 3)) },
-            2: { q: s for q, s in zip(order_major, range(-3, 3)) },
-            3: { q: s for q, s in zip(order_major, range(-3, 3)) },
-            4: { q: s for q, s in zip(order_perfect, range(-2, 3)) },
-            5: { q: s for q, s in zip(order_perfect, range(-2, 3)) },
-            6: { q: s for q, s in zip(order_major, range(-3, 3)) },
-            7: { q: s for q, s in zip(order_major, range(-3, 3)) },
-        }
-
-        semitones += semitones_map[number][self.quality]
-        
-        return semitones
+        octaves = max(0, (self.number - 1) // 7)
+        return octaves * 12 + _SEMITONES_TABLE[(self.number - octaves * 7, self.quality)]
 
     @staticmethod
     def get_quality(number, halves):
-        while number > 7:
-            number -= 7
-            halves -= 2
-
-        order_perfect = ['dd', 'd', 'P', 'A', 'AA']
-        order_major = ['dd', 'd', 'm', 'M', 'A', 'AA']
-        quality_map = {
-            1: { h: q for q, h in zip(list(reversed(order_perfect)), range(-2, 3)) },
-            2: { h: q for q, h in zip(list(reversed(order_major)), range(-2, 4)) },
-            3: { h: q for q, h in zip(list(reversed(order_major)), range(-2, 4)) },
-            4: { h: q for q, h in zip(list(reversed(order_perfect)), range(-1, 4)) },
-            5: { h: q for q, h in zip(list(reversed(order_perfect)), range(-1, 4)) },
-            6: { h: q for q, h in zip(list(reversed(order_major)), range(-1, 5)) },
-            7: { h: q for q, h in zip(list(reversed(order_major)), range(-1, 5)) },
-        }
-
+        octaves = max(0, (number - 1) // 7)
         # TODO: add out of range exception
-        return quality_map[number][halves]
+        return _QUALITY_TABLE[number - octaves * 7][halves - octaves * 2]
+
+
+_TONES = ('C', 'D', 'E', 'F', 'G', 'A', 'B')
+_TONE_INDEX = { tone: index for index, tone in enumerate(_TONES) }
+_TONE_SEMITONES = (0, 2, 4, 5, 7, 9, 11)
+_SEMITONE_NOTATION = { 3: '#x', 2: 'x', 1: '#', 0: '', -1: 'b', -2: 'bb', -3: 'bbb' }
+
+
+def _natural_midi_number(step):
+    return 12 + (step // 7) * 12 + _TONE_SEMITONES[step % 7]
+
+
+_note_pool = {}
+_note_notation_cache = {}
+
+
+def _intern_note(step, midi):
+    note = _note_pool.get((step, midi))
+    if note is None:
+        note = object.__new__(Note)
+        object.__setattr__(note, 'step', step)
+        object.__setattr__(note, 'midi', midi)
+        _note_pool[(step, midi)] = note
+    return note
 
 
 class Note:
-    def __init__(self, notation=None, octave=None, tone=None, semitones=None):
+    # A note is stored as its diatonic step index (tone index + octave * 7) and
+    # its midi number; tone, octave and semitones are derived from those two.
+    # Notes are interned and immutable like intervals, and hash by midi number.
+    __slots__ = ('step', 'midi')
+
+    def __new__(cls, notation=None, octave=None, tone=None, semitones=None):
         if notation:
+            cached = _note_notation_cache.get(notation)
+            if cached is not None:
+                return cached
             # TODO: add notation syntax check
             octave = int(re.sub('[^0-9]', '', notation))
             tone = re.sub('[^A-G]', '', notation)
             semitones = notation.count('#') + 2 * notation.count('x') - notation.count('b')
-        
-        self.octave = octave
-        self.tone = tone
-        self.semitones = semitones if semitones else 0
+
+        step = _TONE_INDEX[tone] + octave * 7
+        note = _intern_note(step, _natural_midi_number(step) + (semitones if semitones else 0))
+
+        if notation:
+            _note_notation_cache[notation] = note
+        return note
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Note is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Note is immutable')
+
+    def __reduce__(self):
+        return (_intern_note, (self.step, self.midi))
+
+    def __hash__(self):
+        return hash(self.midi)
+
+    def pitch_class(self):
+        return self.midi % 12
+
+    @property
+    def octave(self):
+        return self.step // 7
+
+    @property
+    def tone(self):
+        return _TONES[self.step % 7]
+
+    @property
+    def semitones(self):
+        return self.midi - _natural_midi_number(self.step)
     
     def replace(self, notation=None, octave=None, tone=None, semitones=None):
         return Note(
@@ -122,27 +194,21 @@ class Note:
         )
     
     def sharp(self):
-        return Note(octave=self.octave, tone=self.tone, semitones=self.semitones + 1)
+        return _intern_note(self.step, self.midi + 1)
 
     def flat(self):
-        return Note(octave=self.octave, tone=self.tone, semitones=self.semitones - 1)
+        return _intern_note(self.step, self.midi - 1)
 
     def add_octave(self, diff):
-        return Note(octave=self.octave + diff, tone=self.tone, semitones=self.semitones)
+        return _intern_note(self.step + diff * 7, self.midi + diff * 12)
 
     def midi_number(self):
-        return Note._tone_to_midi_number(self.tone) + self.semitones + self.octave * 12
+        return self.midi
 
     def __sub__(self, other):
         if isinstance(other, Note):
-            tone_index_a = Note._tone_to_index(self.tone) + self.octave * 7
-            tone_index_b = Note._tone_to_index(other.tone) + other.octave * 7
-            number = tone_index_a - tone_index_b + 1
-
-            midi_number_a = self.midi_number()
-            midi_number_b = other.midi_number()
-            halves = (number - 1) * 2 - (midi_number_a - midi_number_b)
-
+            number = self.step - other.step + 1
+            halves = (number - 1) * 2 - (self.midi - other.midi)
             return Interval(number=number, quality=Interval.get_quality(number, halves))
 
         elif isinstance(other, Interval):
@@ -154,30 +220,9 @@ class Note:
     def __add__(self, other):
         if isinstance(other, Interval):
             if not other.inverted:
-                tone_index_self = Note._tone_to_index(self.tone) + self.octave * 7
-                tone_index_other = other.number - 1
-                tone_index_result = tone_index_self + tone_index_other
-                tone_result = Note._index_to_tone(tone_index_result)
-                octave_result = tone_index_result // 7
-
-                note_neutral = Note(octave=octave_result, tone=tone_result, semitones=0)
-                semitones_interval = other.get_semitones()
-                semitones_neutral = note_neutral.midi_number() - self.midi_number()
-
-                return Note(octave=octave_result, tone=tone_result, semitones=semitones_interval - semitones_neutral)
-            
+                return _intern_note(self.step + other.number - 1, self.midi + other.get_semitones())
             else:
-                tone_index_self = Note._tone_to_index(self.tone) + self.octave * 7
-                tone_index_other = other.number - 1
-                tone_index_result = tone_index_self - tone_index_other
-                tone_result = Note._index_to_tone(tone_index_result)
-                octave_result = tone_index_result // 7
-
-                note_neutral = Note(octave=octave_result, tone=tone_result, semitones=0)
-                semitones_interval = other.get_semitones()
-                semitones_neutral = note_neutral.midi_number() - self.midi_number()
-
-                return Note(octave=octave_result, tone=tone_result, semitones=-(semitones_interval + semitones_neutral))
+                return _intern_note(self.step - other.number + 1, self.midi - other.get_semitones())
 
         else:
             raise ValueError('Need to add Interval and Note')
@@ -186,43 +231,170 @@ class Note:
         return self.__add__(other)
 
     def __eq__(self, other):
-        return self.midi_number() == other.midi_number()
+        return self.midi == other.midi
 
     def __str__(self):
         return self.tone + Note._semitone_notation(self.semitones) + str(self.octave)
 
     def __lt__(self, other):
-        return self.midi_number() < other.midi_number()
+        return self.midi < other.midi
     
     def __le__(self, other):
-        return self.midi_number() <= other.midi_number()
+        return self.midi <= other.midi
     
     def __gt__(self, other):
-        return self.midi_number() > other.midi_number()
+        return self.midi > other.midi
 
     def __ge__(self, other):
-        return self.midi_number() >= other.midi_number()
+        return self.midi >= other.midi
 
     @staticmethod
     def _tone_to_midi_number(tone):
-        numbers = { 'C': 12, 'D': 14, 'E': 16, 'F': 17, 'G': 19, 'A': 21, 'B': 23 }
-        return numbers[tone]
+        return 12 + _TONE_SEMITONES[_TONE_INDEX[tone]]
 
     @staticmethod
     def _tone_to_index(tone):
-        tone_map = { tone: num for num, tone in enumerate(['C', 'D', 'E', 'F', 'G', 'A', 'B']) }
-        return tone_map[tone]
+        return _TONE_INDEX[tone]
 
     @staticmethod
     def _index_to_tone(index):
-        return ['C', 'D', 'E', 'F', 'G', 'A', 'B'][index % 7]
+        return _TONES[index % 7]
 
     @staticmethod
     def _semitone_notation(semitones):
-        return { 3: '#x', 2: 'x', 1: '#', 0: '', -1: 'b', -2: 'bb', -3: 'bbb' }[semitones]
+        return _SEMITONE_NOTATION[semitones]
+
+
+import numpy as np
+
+_TONE_SEMITONES_ARRAY = np.array(_TONE_SEMITONES)
+
+
+def _natural_midi_numbers(steps):
+    return 12 + (steps // 7) * 12 + _TONE_SEMITONES_ARRAY[steps % 7]
+
+
+class NoteArray:
+    # Batch counterpart of Note: step indices and midi numbers live in
+    # parallel integer arrays so transforms run once per array, not per note.
+    __slots__ = ('steps', 'midis')
+
+    def __init__(self, notes=()):
+        notes = list(notes)
+        self.steps = np.array([n.step for n in notes], dtype=np.int64)
+        self.midis = np.array([n.midi for n in notes], dtype=np.int64)
+
+    @staticmethod
+    def from_arrays(steps, midis):
+        array = NoteArray.__new__(NoteArray)
+        array.steps = np.asarray(steps, dtype=np.int64)
+        array.midis = np.asarray(midis, dtype=np.int64)
+        return array
+
+    @property
+    def octaves(self):
+        return self.steps // 7
+
+    @property
+    def semitones(self):
+        return self.midis - _natural_midi_numbers(self.steps)
+
+    def midi_numbers(self):
+        return self.midis
+
+    def pitch_classes(self):
+        return self.midis % 12
+
+    def to_notes(self):
+        return [_intern_note(step, midi) for step, midi in zip(self.steps.tolist(), self.midis.tolist())]
+
+    def add_octave(self, diff):
+        diff = np.asarray(diff)
+        return NoteArray.from_arrays(self.steps + diff * 7, self.midis + diff * 12)
+
+    def bound(self, low, high):
+        # same folding as _Bound: lower by octaves until <= high, then raise until >= low
+        down = np.maximum(0, -((high.midi - self.midis) // 12))
+        midis = self.midis - down * 12
+        up = np.maximum(0, -((midis - low.midi) // 12))
+        return self.add_octave(up - down)
+
+    def __len__(self):
+        return len(self.midis)
+
+    def __iter__(self):
+        return iter(self.to_notes())
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return _intern_note(int(self.steps[index]), int(self.midis[index]))
+        return NoteArray.from_arrays(self.steps[index], self.midis[index])
+
+    def __add__(self, other):
+        if isinstance(other, Interval):
+            if not other.inverted:
+                return NoteArray.from_arrays(self.steps + (other.number - 1), self.midis + other.get_semitones())
+            else:
+                return NoteArray.from_arrays(self.steps - (other.number - 1), self.midis - other.get_semitones())
+
+        else:
+            raise ValueError('Need to add Interval and NoteArray')
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        if isinstance(other, Interval):
+            return self + (-other)
+
+        else:
+            raise ValueError('Subtraction is supported only with Interval')
+
+    @staticmethod
+    def _midis_of(other):
+        if isinstance(other, Note):
+            return other.midi
+        elif isinstance(other, NoteArray):
+            return other.midis
+        else:
+            raise ValueError('Comparison is supported only with Note or NoteArray')
+
+    def __eq__(self, other):
+        return self.midis == NoteArray._midis_of(other)
+
+    def __ne__(self, other):
+        return self.midis != NoteArray._midis_of(other)
+
+    def __lt__(self, other):
+        return self.midis < NoteArray._midis_of(other)
+
+    def __le__(self, other):
+        return self.midis <= NoteArray._midis_of(other)
+
+    def __gt__(self, other):
+        return self.midis > NoteArray._midis_of(other)
+
+    def __ge__(self, other):
+        return self.midis >= NoteArray._midis_of(other)
+
+    __hash__ = None
 
 
 from .utils import length_notation
+from functools import lru_cache
+
+
+_CHORD_SYMBOLS = {
+    'm': 'minor', 'min': 'minor', '-': 'minor',
+    'M': 'major', 'Ma': 'major', 'Maj': 'major', 'maj': 'major',
+    '+': 'augumented', 'aug': 'augumented',
+    'o': 'diminished', 'dim': 'diminished',
+    'sus2': 'sus2', 'sus4': 'sus4',
+    '7': '7', 'dom': '7',
+    'M7': '7major', 'maj7': '7major',
+    'b5': 'b5',
+}
+_CHORD_SYMBOL_PATTERN = re.compile('|'.join([re.escape(sym) for sym in reversed(sorted(_CHORD_SYMBOLS.keys()))]))
 
 
 class Chord:
@@ -281,24 +453,13 @@ class Chord:
 
     @staticmethod
     def from_notation(notation):
-        symbol_map = {
-            'm': 'minor', 'min': 'minor', '-': 'minor',
-            'M': 'major', 'Ma': 'major', 'Maj': 'major', 'maj': 'major',
-            '+': 'augumented', 'aug': 'augumented',
-            'o': 'diminished', 'dim': 'diminished',
-            'sus2': 'sus2', 'sus4': 'sus4',
-            '7': '7', 'dom': '7',
-            'M7': '7major', 'maj7': '7major',
-            'b5': 'b5',
-        }
-        symbols = [re.escape(sym) for sym in reversed(sorted(symbol_map.keys()))]
         base = notation[0]
-        matched = re.findall('{}'.format('|'.join(symbols)), notation[1:])
+        matched = _CHORD_SYMBOL_PATTERN.findall(notation[1:])
         
         # TODO: add chord notation syntax check
         tags = set()
         for sym in matched:
-            tags.add(symbol_map[sym])
+            tags.add(_CHORD_SYMBOLS[sym])
         
         if 'major' not in tags and ('minor' not in tags and 'augumented' not in tags and 'diminished' not in tags):
             tags.add('major')
@@ -331,6 +492,8 @@ class Chord:
         # TODO: do full support on note conversion
 
 
+# chord.cache_info() reports hits and misses of the parsed chord cache
+@lru_cache(maxsize=4096)
 def chord(notation, octave=4):
     return Chord.from_notation(notation).to_notes(octave=octave)
 
@@ -340,9 +503,20 @@ def chord(notation, octave=4):
 
 
 
+_ROMAN_NUMBERS = ('i', 'ii', 'iii', 'iv', 'v', 'vi', 'vii')
+
+_scale_tables = {}
+_mode_tables = {}
+
+
 class Scale:
 
+    intervals = ()
+    numbers = None
+    cadences = None
     transitions = {}
+    tension_intervals_primary = {}
+    tension_intervals_secondary = {}
 
     def __init__(self, tonic=None):
         # TODO: check quality syntax
@@ -373,7 +547,7 @@ class Scale:
         return note
 
     def note_interval(self, index):
-        return None
+        return Interval(self.intervals[index - 1])
 
     def diatonic(self, number, include_seventh=False):
         index = self.number_to_int(number)
@@ -387,12 +561,29 @@ class Scale:
         base = self.note(index) + Interval('P5')
         for _ in range(extend):
             base += Interval('P5')
-        return chord(base.tone + '7', octave=self.tonic.octave)
+        # dominant seventh on the root's spelling (accidentals included) in the tonic's octave
+        root = base.add_octave(self.tonic.octave - base.octave)
+        return (root, root + Interval('M3'), root + Interval('P5'), root + Interval('m7'))
 
     def chord_canonical(self, number):
         return Chord.from_notes(self.chord(number))
 
+    def _tables(self):
+        # chord and tension tables are compiled lazily and shared by every scale of the same mode and tonic
+        key = (type(self), self.tonic.step, self.tonic.midi)
+        tables = _scale_tables.get(key)
+        if tables is None:
+            tables = _scale_tables[key] = { 'chord': {}, 'primary': {}, 'secondary': {}, 'masks': {} }
+        return tables
+
     def chord(self, number):
+        chords = self._tables()['chord']
+        result = chords.get(number)
+        if result is None:
+            result = chords[number] = self._compile_chord(number)
+        return result
+
+    def _compile_chord(self, number):
         number = number.lower()
         if re.match(r'^(vii|iii|iv|vi|ii|i|v)(7)?$', number):
             base_num, seventh = re.match(r'(vii|iii|iv|vi|ii|i|v)(7)?', number).groups()
@@ -404,26 +595,100 @@ class Scale:
             raise ValueError('No matching chord like "{}"'.format(number))
 
     def available_tension_note_primary(self, number):
-        return None
+        tensions = self._tables()['primary']
+        result = tensions.get(number)
+        if result is None:
+            result = tensions[number] = self._compile_tension_note(number, self.tension_intervals_primary)
+        return result
     
     def available_tension_note_secondary(self, number):
-        return None
+        tensions = self._tables()['secondary']
+        result = tensions.get(number)
+        if result is None:
+            result = tensions[number] = self._compile_tension_note(number, self.tension_intervals_secondary)
+        return result
+
+    def _compile_tension_note(self, number, intervals_map):
+        number = self._sanitize_seventh(number.lower())
+        base = self.note(number)
+        return tuple([base + Interval(intv) for intv in intervals_map[number]])
+
+    def pitch_class_masks(self, number):
+        # 12-bit pitch class masks of (root and third, fifth and seventh, primary tensions, secondary tensions)
+        masks = self._tables()['masks']
+        result = masks.get(number)
+        if result is None:
+            base = self.chord(number)
+            groups = (
+                base[:2], base[2:], 
+                self.available_tension_note_primary(number), self.available_tension_note_secondary(number),
+            )
+            result = masks[number] = tuple([sum(set([1 << n.pitch_class() for n in group])) for group in groups])
+        return result
 
     def available_tension_note(self, number):
         return self.available_tension_note_primary(number) + self.available_tension_note_secondary(number)
 
     def possible_numbers(self):
-        return None
+        return self.numbers
     
     def possible_cadences(self):
-        return None
+        return self.cadences
     
     def _sanitize_seventh(self, c):
         if c[-1] == '7':
             return c[:-1]
         return c
 
+    def _mode_tables(self):
+        # chord ids and the transition matrix depend only on the mode, so they are shared per class
+        tables = _mode_tables.get(type(self))
+        if tables is None:
+            vocabulary = list(self.possible_numbers())
+            for number in _ROMAN_NUMBERS:
+                for variant in (number, number + '7', 'v7/' + number):
+                    if variant not in vocabulary:
+                        vocabulary.append(variant)
+
+            transitable = np.zeros((len(vocabulary), len(vocabulary)), dtype=bool)
+            for i, a in enumerate(vocabulary):
+                for j, b in enumerate(vocabulary):
+                    try:
+                        transitable[i, j] = self._is_transitable_by_name(a, b)
+                    except KeyError:
+                        pass
+            transitable.setflags(write=False)
+
+            tables = _mode_tables[type(self)] = {
+                'vocabulary': tuple(vocabulary),
+                'ids': { number: i for i, number in enumerate(vocabulary) },
+                'transitable': transitable,
+                'transitable_rows': transitable.tolist(),
+            }
+        return tables
+
+    def vocabulary(self):
+        # chord numbers indexed by chord id; the first len(possible_numbers()) ids are the candidates
+        return self._mode_tables()['vocabulary']
+
+    def chord_id(self, number):
+        try:
+            return self._mode_tables()['ids'][number]
+        except KeyError:
+            raise ValueError('No matching chord like "{}"'.format(number))
+
+    def transition_matrix(self):
+        # read-only boolean matrix, transition_matrix()[a, b] is True when chord id a may move to b
+        return self._mode_tables()['transitable']
+
     def is_transitable(self, a, b):
+        tables = self._mode_tables()
+        return tables['transitable_rows'][tables['ids'][a]][tables['ids'][b]]
+
+    def is_transitable_id(self, a, b):
+        return self._mode_tables()['transitable_rows'][a][b]
+
+    def _is_transitable_by_name(self, a, b):
         a = self._sanitize_seventh(a)
         b = self._sanitize_seventh(b)
         if a[:3] == 'v7/':
@@ -436,6 +701,10 @@ class Scale:
 
 class MajorScale(Scale):
 
+    intervals = ('P1', 'M2', 'M3', 'P4', 'P5', 'M6', 'M7')
+    numbers = ['i', 'ii', 'iii', 'iv', 'v', 'vi', 'v7/ii', 'v7/iii', 'v7/iv', 'v7/v', 'v7/vi']
+    cadences = ['i', 'v']
+
     transitions = {
         'i': ['i', 'iii',  'vi', 'ii', 'iv', 'v'],
         'ii': ['ii', 'iii', 'v'],
@@ -445,80 +714,55 @@ class MajorScale(Scale):
         'vi': ['vi', 'iii', 'ii', 'iv'],
     }
 
-    def note_interval(self, index):
-        return {
-            1: Interval('P1'),
-            2: Interval('M2'),
-            3: Interval('M3'),
-            4: Interval('P4'),
-            5: Interval('P5'),
-            6: Interval('M6'),
-            7: Interval('M7'),
-        }[index]
+    tension_intervals_primary = {
+        'i': ['M9', 'M13'],
+        'ii': ['M9', 'P11'],
+        'iii': ['P11'],
+        'iv': ['M9', 'A11', 'M13'],
+        'v': ['M9', 'M13'],
+        'vi': ['M9', 'P11'],
+        'vii': ['P11', 'm13'],
+        'v7/ii': ['m9', 'M9', 'A9', 'm13'],
+        'v7/iii': ['m9', 'A9', 'm13'],
+        'v7/iv': ['M9', 'M13'],
+        'v7/v': ['M9', 'M13'],
+        'v7/vi': ['m9', 'A9', 'm13'],
+    }
+
+    tension_intervals_secondary = {
+        'i': ['A11'],
+        'ii': [],
+        'iii': ['M9'],
+        'iv': [],
+        'v': ['m9', 'A9', 'A11', 'm13'],
+        'vi': ['M13'],
+        'vii': [],
+        'v7/ii': ['A11', 'M13'],
+        'v7/iii': ['A11'],
+        'v7/iv': ['m9', 'A9', 'A11', 'm13'],
+        'v7/v': ['m9', 'A9', 'A11', 'm13'],
+        'v7/vi': ['M9', 'A11'],
+    }
 
-    def available_tension_note_primary(self, number):
-        number = number.lower()
-        if number[-1] == '7':
-            number = number[:-1]
-        intervals_map = {
-            'i': [Interval('M9'), Interval('M13')],
-            'ii': [Interval('M9'), Interval('P11')],
-            'iii': [Interval('P11')],
-            'iv': [Interval('M9'), Interval('A11'), Interval('M13')],
-            'v': [Interval('M9'), Interval('M13')],
-            'vi': [Interval('M9'), Interval('P11')],
-            'vii': [Interval('P11'), Interval('m13')],
-            'v7/ii': [Interval('m9'), Interval('M9'), Interval('A9'), Interval('m13')],
-            'v7/iii': [Interval('m9'), Interval('A9'), Interval('m13')],
-            'v7/iv': [Interval('M9'), Interval('M13')],
-            'v7/v': [Interval('M9'), Interval('M13')],
-            'v7/vi': [Interval('m9'), Interval('A9'), Interval('m13')],
-        }
-        base = self.note(number)
-        return [base + intv for intv in intervals_map[number]]
-    
-    def available_tension_note_secondary(self, number):
-        number = number.lower()
-        if number[-1] == '7':
-            number = number[:-1]
-        intervals_map = {
-            'i': [Interval('A11')],
-            'ii': [],
-            'iii': [Interval('M9')],
-            'iv': [],
-            'v': [Interval('m9'), Interval('A9'), Interval('A11'), Interval('m13')],
-            'vi': [Interval('M13')],
-            'vii': [],
-            'v7/ii': [Interval('A11'), Interval('M13')],
-            'v7/iii': [Interval('A11')],
-            'v7/iv': [Interval('m9'), Interval('A9'), Interval('A11'), Interval('m13')],
-            'v7/v': [Interval('m9'), Interval('A9'), Interval('A11'), Interval('m13')],
-            'v7/vi': [Interval('M9'), Interval('A11')],
-        }
-        base = self.note(number)
-        return [base + intv for intv in intervals_map[number]]
-    
-    def possible_numbers(self):
-        return ['i', 'ii', 'iii', 'iv', 'v', 'vi', 'v7/ii', 'v7/iii', 'v7/iv', 'v7/v', 'v7/vi']
-    
-    def possible_cadences(self):
-        return ['i', 'v']
 
 
 class SimpleMajorScale(MajorScale):
 
+    numbers = ['i', 'iv', 'v']
+
     transitions = {
         'i': ['i', 'iv', 'v'],
         'iv': ['i', 'iv', 'v'],
         'v': ['i', 'iv', 'v'],
     }
 
-    def possible_numbers(self):
-        return ['i', 'iv', 'v']
-
 
 class NaturalMinorScale(Scale):
 
+    intervals = ('P1', 'M2', 'm3', 'P4', 'P5', 'm6', 'm7')
+    numbers = ['i', 'ii', 'iii', 'iv', 'v', 'vi', 'vii', 'v7/iii', 'v7/iv', 'v7/v', 'v7/vi', 'v7/vii']
+    cadences = ['i', 'v']
+
     transitions = {
         'i': ['i', 'ii', 'iii', 'iv', 'v', 'vi', 'vii'],
         'ii': ['ii', 'iii', 'v'],
@@ -529,16 +773,35 @@ class NaturalMinorScale(Scale):
         'vii': ['i', 'iii', 'v', 'vi', 'vii']
     }
 
-    def note_interval(self, index):
-        return {
-            1: Interval('P1'),
-            2: Interval('M2'),
-            3: Interval('m3'),
-            4: Interval('P4'),
-            5: Interval('P5'),
-            6: Interval('m6'),
-            7: Interval('m7'),
-        }[index]
+    tension_intervals_primary = {
+        'i': ['M9', 'P11'],
+        'ii': ['P11', 'm13'],
+        'iii': ['M9', 'M13'],
+        'iv': ['M9', 'P11', 'M13'],
+        'v': ['m9', 'A9', 'm13'],
+        'vi': ['M9', 'A9', 'M13'],
+        'vii': ['M9', 'M13'],
+        'v7/iii': ['M9', 'M13'],
+        'v7/iv': ['m9', 'M9', 'A9', 'm13'],
+        'v7/v': ['m9', 'A9', 'm13'],
+        'v7/vi': ['M9', 'M13'],
+        'v7/vii': ['M9', 'A9', 'M13'],
+    }
+
+    tension_intervals_secondary = {
+        'i': ['M13'],
+        'ii': [],
+        'iii': ['A11'],
+        'iv': [],
+        'v': ['M9', 'A11'],
+        'vi': [],
+        'vii': [],
+        'v7/iii': ['m9', 'A11', 'm13'],
+        'v7/iv': ['A11', 'M13'],
+        'v7/v': ['A11'],
+        'v7/vi': ['m9', 'A11', 'm13'],
+        'v7/vii': ['m9', 'A9', 'm13'],
+    }
 
     def diatonic(self, number, include_seventh=False):
         if number == 'v':
@@ -546,51 +809,111 @@ class NaturalMinorScale(Scale):
         else:
             return super(NaturalMinorScale, self).diatonic(number, include_seventh=include_seventh)
 
-    def available_tension_note_primary(self, number):
-        number = number.lower()
-        intervals_map = {
-            'i': [Interval('M9'), Interval('P11')],
-            'ii': [Interval('P11'), Interval('m13')],
-            'iii': [Interval('M9'), Interval('M13')],
-            'iv': [Interval('M9'), Interval('P11'), Interval('M13')],
-            'v': [Interval('m9'), Interval('A9'), Interval('m13')],
-            'vi': [Interval('M9'), Interval('A9'), Interval('M13')],
-            'vii': [Interval('M9'), Interval('M13')],
-            'v7/iii': [Interval('M9'), Interval('M13')],
-            'v7/iv': [Interval('m9'), Interval('M9'), Interval('A9'), Interval('m13')],
-            'v7/v': [Interval('m9'), Interval('A9'), Interval('m13')],
-            'v7/vi': [Interval('M9'), Interval('M13')],
-            'v7/vii': [Interval('M9'), Interval('A9'), Interval('M13')],
-        }
-        base = self.note(number)
-        return [base + intv for intv in intervals_map[number]]
-    
-    def available_tension_note_secondary(self, number):
-        number = number.lower()
-        intervals_map = {
-            'i': [Interval('M13')],
-            'ii': [],
-            'iii': [Interval('A11')],
-            'iv': [],
-            'v': [Interval('M9'), Interval('A11')],
-            'vi': [],
-            'vii': [],
-            'v7/iii': [Interval('m9'), Interval('A11'), Interval('m13')],
-            'v7/iv': [Interval('A11'), Interval('M13')],
-            'v7/v': [Interval('A11')],
-            'v7/vi': [Interval('m9'), Interval('A11'), Interval('m13')],
-            'v7/vii': [Interval('m9'), Interval('A9'), Interval('m13')],
-        }
-        base = self.note(number)
-        return [base + intv for intv in intervals_map[number]]
-    
-    def possible_numbers(self):
-        return ['i', 'ii', 'iii', 'iv', 'v', 'vi', 'vii', 'v7/iii', 'v7/iv', 'v7/v', 'v7/vi', 'v7/vii']
-    
-    def possible_cadences(self):
-        return ['i', 'v']
 
-    
+_DOMINANT_TENSIONS = (('m9', 13), ('M9', 14), ('A9', 15), ('A11', 18), ('m13', 20), ('M13', 21))
+
+
+def _interval_of(number, semitones):
+    return str(Interval(number=number, quality=Interval.get_quality(number, (number - 1) * 2 - semitones)))
+
+
+_FUNCTIONS = ('tonic', 'predominant', 'tonic', 'predominant', 'dominant', 'tonic', 'dominant')
+_FUNCTION_PROGRESSIONS = (('tonic', 'predominant'), ('predominant', 'dominant'), ('dominant', 'tonic'))
+
+
+def _functional_transitions(triads):
+    transitions = {}
+    for a in triads:
+        x = _ROMAN_NUMBERS.index(a)
+        transitions[a] = []
+        for b in triads:
+            y = _ROMAN_NUMBERS.index(b)
+            if x == 0 or x == y or (y - x) % 7 in (3, 5) or (_FUNCTIONS[x], _FUNCTIONS[y]) in _FUNCTION_PROGRESSIONS:
+                transitions[a].append(b)
+    return transitions
+
+
+def scale_mode(name, steps, cadences=('i', 'v')):
+    # Builds a Scale subclass from a step pattern in semitones, e.g. (2, 1, 2, 2, 2, 1, 2) for dorian.
+    # Tensions are derived from the mode: diatonic 9/11/13 that are not a minor ninth above a chord
+    # tone are primary, and those avoid notes raised by a semitone are secondary. Secondary dominants
+    # take their diatonic alterations as primary and chromatic ones as secondary.
+    # Transitions follow functional harmony rather than a hand-tuned table: degrees i, iii and vi are
+    # tonic, ii and iv predominant, v and vii dominant, and a chord may repeat, move down a fifth or a
+    # third, go from tonic to predominant, predominant to dominant, dominant to tonic, and the tonic
+    # chord may go anywhere. This is close to MajorScale.transitions but is only a rule of thumb for
+    # modes whose functions are weak, e.g. the dominant of phrygian or locrian.
+    if len(steps) != 7 or sum(steps) != 12:
+        raise ValueError('Step pattern needs 7 steps spanning an octave')
+
+    degrees = [sum(steps[:k]) for k in range(7)]
+    pitch_classes = set(degrees)
+
+    def semitones(degree):
+        return (degree // 7) * 12 + degrees[degree % 7]
+
+    numbers = []
+    primary = {}
+    secondary = {}
+    for root, number in enumerate(_ROMAN_NUMBERS):
+        chord_tones = [semitones(root + k) - semitones(root) for k in (0, 2, 4, 6)]
+        if root == 0 or chord_tones[1:3] != [3, 6]:
+            numbers.append(number)
+
+        primary[number] = []
+        secondary[number] = []
+        for tension in (9, 11, 13):
+            tension_semitones = semitones(root + tension - 1) - semitones(root)
+            if all((tension_semitones - t) % 12 != 1 for t in chord_tones):
+                primary[number].append(_interval_of(tension, tension_semitones))
+            elif all((tension_semitones + 1 - t) % 12 not in (0, 1) for t in chord_tones):
+                secondary[number].append(_interval_of(tension, tension_semitones + 1))
+
+    for root, number in list(enumerate(_ROMAN_NUMBERS))[1:]:
+        triad = [semitones(root + k) - semitones(root) for k in (2, 4)]
+        if triad not in ([4, 7], [3, 7]):
+            continue
+        dominant = 'v7/' + number
+        numbers.append(dominant)
+
+        # tension notes are stacked on Scale.note(dominant), as in the hand-written modes
+        base = semitones(root + 5)
+        primary[dominant] = [t for t, h in _DOMINANT_TENSIONS if (base + h) % 12 in pitch_classes]
+        secondary[dominant] = [t for t, h in _DOMINANT_TENSIONS if (base + h) % 12 not in pitch_classes]
+
+    return type(name, (Scale,), {
+        'intervals': tuple([_interval_of(k + 1, d) for k, d in enumerate(degrees)]),
+        'numbers': numbers,
+        'cadences': list(cadences),
+        'transitions': _functional_transitions([number for number in numbers if '/' not in number]),
+        'tension_intervals_primary': primary,
+        'tension_intervals_secondary': secondary,
+    })
+
+
+DorianScale = scale_mode('DorianScale', (2, 1, 2, 2, 2, 1, 2))
+PhrygianScale = scale_mode('PhrygianScale', (1, 2, 2, 2, 1, 2, 2))
+LydianScale = scale_mode('LydianScale', (2, 2, 2, 1, 2, 2, 1))
+MixolydianScale = scale_mode('MixolydianScale', (2, 2, 1, 2, 2, 1, 2))
+LocrianScale = scale_mode('LocrianScale', (1, 2, 2, 1, 2, 2, 2))
+HarmonicMinorScale = scale_mode('HarmonicMinorScale', (2, 1, 2, 2, 1, 3, 1))
+MelodicMinorScale = scale_mode('MelodicMinorScale', (2, 1, 2, 2, 2, 2, 1))
+
+MODES = {
+    'ionian': MajorScale,
+    'major': MajorScale,
+    'dorian': DorianScale,
+    'phrygian': PhrygianScale,
+    'lydian': LydianScale,
+    'mixolydian': MixolydianScale,
+    'aeolian': NaturalMinorScale,
+    'minor': NaturalMinorScale,
+    'locrian': LocrianScale,
+    'harmonic_minor': HarmonicMinorScale,
+    'melodic_minor': MelodicMinorScale,
+}
+
+
 if __name__ == '__main__':
     import unittest
 
@@ -637,8 +960,141 @@ if __name__ == '__main__':
             ]
             for top, base, interval in cases:
                 self.assertEqual(str(Note(base) + Interval(interval)), str(Note(top)))
+
+        def test_encoding(self):
+            cases = [
+                ('C4', 28, 60),
+                ('Bb4', 34, 70),
+                ('B#3', 27, 60),
+                ('Cb4', 28, 59),
+                ('C##4', 28, 62),
+            ]
+            for notation, step, midi in cases:
+                note = Note(notation)
+                self.assertEqual((note.step, note.midi_number()), (step, midi))
+                self.assertEqual(str(Note(octave=note.octave, tone=note.tone, semitones=note.semitones)), str(note))
+
+        def test_hashing(self):
+            self.assertIs(Note('C5'), Note('C5'))
+            self.assertIs(Note('C4') + Interval('P8'), Note('C5'))
+            self.assertEqual(len({ Note('C#5'), Note('Db5'), Note('C#4') }), 2)
+            self.assertEqual(Note('B#4').pitch_class(), Note('C4').pitch_class())
+            self.assertEqual(len({ Interval('A4'), Interval('d5'), Interval('P5') }), 2)
     
 
+    class TestNoteArrayClass(unittest.TestCase):
+
+        def test_transpose(self):
+            notes = [Note(n) for n in ['Bb4', 'E5', 'F#3', 'Cb4', 'G#6']]
+            array = NoteArray(notes)
+            for interval in ['M3', 'P8', '-P15', 'A4', 'dd5']:
+                self.assertEqual([str(n) for n in array + Interval(interval)], [str(n + Interval(interval)) for n in notes])
+
+        def test_bound(self):
+            notes = [Note(n) for n in ['Bb2', 'E5', 'F#3', 'C4', 'G#6', 'B3']]
+            low, high = Note('C4'), Note('B4')
+            expected = []
+            for note in notes:
+                while note > high:
+                    note -= Interval('P8')
+                while note < low:
+                    note += Interval('P8')
+                expected.append(str(note))
+            self.assertEqual([str(n) for n in NoteArray(notes).bound(low, high)], expected)
+            self.assertEqual(list(NoteArray(notes).pitch_classes()), [n.pitch_class() for n in notes])
+
+
+    class TestIntervalClass(unittest.TestCase):
+
+        def test_semitones(self):
+            cases = [('P1', 0), ('m3', 3), ('A4', 6), ('d5', 6), ('M7', 11), ('P8', 12), ('M9', 14), ('A11', 18), ('P15', 24)]
+            for interval, semitones in cases:
+                self.assertEqual(Interval(interval).get_semitones(), semitones)
+
+        def test_interning(self):
+            self.assertIs(Interval('M3'), Interval('M3'))
+            self.assertIs(Interval('M3'), Interval(number=3, quality='M'))
+            self.assertIs(-Interval('P8'), Interval('-P8'))
+            self.assertIs(-Interval('-P8'), Interval('P8'))
+            with self.assertRaises(AttributeError):
+                Interval('P5').number = 4
+
+
+    class TestScaleClass(unittest.TestCase):
+
+        def test_pitch_class_masks(self):
+            scale = MajorScale(tonic=Note('C5'))
+            consonance, fifth, primary, secondary = scale.pitch_class_masks('v7')
+            self.assertEqual(consonance, (1 << 7) | (1 << 11))
+            self.assertEqual(fifth, (1 << 2) | (1 << 5))
+            self.assertEqual(primary, (1 << 9) | (1 << 4))
+            self.assertEqual(secondary, (1 << 8) | (1 << 10) | (1 << 1) | (1 << 3))
+
+        def test_shared_tables(self):
+            a, b = MajorScale(tonic=Note('C5')), MajorScale(tonic=Note('C5'))
+            self.assertIs(a.chord('v7/v'), b.chord('v7/v'))
+            self.assertIs(a.available_tension_note_primary('ii'), b.available_tension_note_primary('ii'))
+            self.assertEqual(a.chord('ii7'), (Note('D5'), Note('F5'), Note('A5'), Note('C6')))
+            self.assertEqual(a.available_tension_note_primary('iv'), (Note('G6'), Note('B6'), Note('D7')))
+            self.assertIsNot(a.chord('i'), MajorScale(tonic=Note('Bb4')).chord('i'))
+
+        def test_secondary_dominant_spelling(self):
+            # a dominant seventh stacked on the root a fifth above Scale.note(number), spelled with its
+            # accidental and placed in the tonic's octave
+            altered = []
+            for scale in [MajorScale(tonic=Note('C5')), MajorScale(tonic=Note('Eb4')), NaturalMinorScale(tonic=Note('F#4'))]:
+                for number in scale.possible_numbers():
+                    if not number.startswith('v7/'):
+                        continue
+                    spelled = str(scale.note(number) + Interval('P5')).rstrip('0123456789')
+                    root = scale.chord(number)[0]
+                    self.assertEqual(str(root).rstrip('0123456789'), spelled)
+                    self.assertEqual(root.octave, scale.tonic.octave)
+                    self.assertEqual([str(n - root) for n in scale.chord(number)[1:]], ['M3', 'P5', 'm7'])
+                    altered += [spelled] if len(spelled) > 1 else []
+            self.assertTrue(altered)
+
+
+    class TestScaleModeFunction(unittest.TestCase):
+
+        def test_intervals(self):
+            self.assertEqual(scale_mode('Ionian', (2, 2, 1, 2, 2, 2, 1)).intervals, MajorScale.intervals)
+            self.assertEqual(HarmonicMinorScale.intervals, ('P1', 'M2', 'm3', 'P4', 'P5', 'm6', 'M7'))
+            self.assertIn('i', LocrianScale.numbers)
+            with self.assertRaises(ValueError):
+                scale_mode('Broken', (2, 2, 2, 2, 2, 2))
+
+        def test_chords(self):
+            dorian = MODES['dorian'](tonic=Note('D4'))
+            self.assertEqual(dorian.chord('iv7'), (Note('G4'), Note('B4'), Note('D5'), Note('F5')))
+            self.assertEqual(dorian.available_tension_note_primary('i'), (Note('E5'), Note('G5'), Note('B5')))
+            self.assertTrue(dorian.is_transitable('v7/ii', 'ii'))
+
+        def test_transition_matrix(self):
+            for cls in set(MODES.values()) | { SimpleMajorScale }:
+                scale = cls(tonic=Note('C4'))
+                vocabulary = scale.vocabulary()
+                self.assertEqual(list(vocabulary[:len(scale.possible_numbers())]), scale.possible_numbers())
+                for a in scale.possible_numbers():
+                    for b in scale.possible_numbers():
+                        self.assertEqual(scale.is_transitable(a, b), scale._is_transitable_by_name(a, b))
+                        self.assertEqual(scale.transition_matrix()[scale.chord_id(a), scale.chord_id(b)], scale.is_transitable(a, b))
+
+        def test_functional_transitions(self):
+            ionian = scale_mode('Ionian', (2, 2, 1, 2, 2, 2, 1))
+            self.assertEqual(sorted(ionian.transitions['v']), sorted(MajorScale.transitions['v']))
+            self.assertEqual(ionian.transitions['i'], [n for n in _ROMAN_NUMBERS if n != 'vii'])
+            dorian = MODES['dorian'](tonic=Note('D4'))
+            self.assertTrue(dorian.is_transitable('ii', 'v'))
+            self.assertFalse(dorian.is_transitable('v', 'ii'))
+            self.assertFalse(dorian.is_transitable('v', 'iv'))
+            self.assertTrue(dorian.is_transitable('v7/ii', 'ii'))
+            for cls in (DorianScale, PhrygianScale, LydianScale, MixolydianScale, LocrianScale):
+                for number, targets in cls.transitions.items():
+                    self.assertIn(number, targets)
+                    self.assertTrue(set(targets) <= set(cls.numbers))
+
+
     class TestChordFunction(unittest.TestCase):
 
         def test_chord(self):
@@ -662,5 +1118,10 @@ if __name__ == '__main__':
             for c, octave, notes in cases:
                 self.assertEqual(chord(c, octave=octave), notes)
 
+        def test_cache(self):
+            hits = chord.cache_info().hits
+            self.assertIs(chord('Gm7', octave=3), chord('Gm7', octave=3))
+            self.assertEqual(chord.cache_info().hits, hits + 1)
+
 
     unittest.main()
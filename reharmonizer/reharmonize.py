@@ -1,11 +1,17 @@
 from .note import Note, Interval
+from .cache import content_key, relative_melody_fingerprint, mode_fingerprint
 
 def _get_melody_weight(melody):
     return [key.length for key in melody]
 
 
 from collections import defaultdict
-from math import floor
+from functools import lru_cache
+from fractions import Fraction
+from math import ceil, floor, gcd
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 
 class ChordNode:
@@ -15,6 +21,7 @@ class ChordNode:
         self.start = start
         self.length = length
         self.number = number
+        self.chord_id = None
         self.prevs = []
         self.target = None
     
@@ -37,9 +44,13 @@ class ChordDag:
         for n in self.nodes:
             nodes_at_ending[n.start + n.length].append(n)
         
+        for n in self.nodes:
+            n.chord_id = scale.chord_id(n.number)
+
+        transitable = scale.transition_matrix().tolist()
         for n in self.nodes:
             for m in nodes_at_ending[n.start]:
-                if scale.is_transitable(m.number, n.number):
+                if transitable[m.chord_id][n.chord_id]:
                     n.prev.append(m)
 
     def solve(self, scale):
@@ -66,101 +77,666 @@ class ChordDag:
         return result
 
 
-def _score_melody(scale, melody, number, weight=None, score_consonance=1, score_fifth=0.5, score_primary=0.25, score_secondary=0.125, score_dissonance=-1):
-    is_rest = [key.note is None for key in melody]
-    melody = list(map(lambda x: x[1], filter(lambda x: not x[0], zip(is_rest, melody))))
-    weight = list(map(lambda x: x[1], filter(lambda x: not x[0], zip(is_rest, weight))))
+class ArrayChordDag:
+    # ChordDag keeping node chord ids, values, starts and lengths in parallel arrays. solve() runs
+    # the same dynamic programming as ChordDag.solve, vectorized over the nodes meeting at each
+    # boundary, and only builds ChordNode objects for the returned progression.
+    def __init__(self, scale):
+        self.scale = scale
+        self.chunks = []
 
-    if not melody:
-        return 0
+    def add_node(self, number, value, start, length):
+        self.add_nodes([self.scale.chord_id(number)], [value], start, length)
 
-    base = scale.chord(number)
-    primary = scale.available_tension_note_primary(number)
-    secondary = scale.available_tension_note_secondary(number)
-    
-    def check_tuple(tup, x):
-        for y in tup:
-            if x.replace(octave=0) == y.replace(octave=0):
-                return True
-        return False
+    def add_nodes(self, chord_ids, values, start, length):
+        chord_ids = np.asarray(chord_ids, dtype=np.int32)
+        self.chunks.append((
+            chord_ids,
+            np.asarray(values, dtype=float),
+            np.broadcast_to(np.asarray(start, dtype=float), chord_ids.shape),
+            np.broadcast_to(np.asarray(length, dtype=float), chord_ids.shape),
+        ))
+
+    def solve(self, length_advantage=1.1):
+        return self.solve_k_best(1, length_advantage=length_advantage)[0]
+
+    def solve_k_best(self, k, length_advantage=1.1):
+        # k-best Viterbi: every node keeps its k best (total, predecessor, predecessor rank) entries,
+        # ordered by total with ties going to the earliest inserted predecessor as in solve()
+        chord_ids, values, starts, lengths = [np.concatenate(c) for c in zip(*self.chunks)]
+        ends = starts + lengths
+        actual_values = (lengths ** length_advantage) * values
+        transitable = self.scale.transition_matrix()
+
+        totals = np.full((len(values), k), -np.inf)
+        targets = np.full((len(values), k), -1)
+
+        end_order = np.argsort(ends, kind='stable')
+        end_times, end_first = np.unique(ends[end_order], return_index=True)
+        nodes_at_ending = dict(zip(end_times.tolist(), np.split(end_order, end_first[1:])))
+
+        start_order = np.argsort(starts, kind='stable')
+        start_times, start_first = np.unique(starts[start_order], return_index=True)
+        for timing, group in zip(start_times.tolist(), np.split(start_order, start_first[1:])):
+            prevs = nodes_at_ending.get(timing)
+            if prevs is None:
+                totals[group, 0] = actual_values[group]
+                continue
+            allowed = transitable[chord_ids[prevs][None, :], chord_ids[group][:, None]]
+            candidates = np.where(allowed[:, :, None], totals[prevs][None, :, :], -np.inf).reshape(len(group), -1)
+            best = np.argsort(-candidates, axis=1, kind='stable')[:, :k]
+            has_prev = allowed.any(axis=1)[:, None]
+            fresh = np.full((len(group), k), -np.inf)
+            fresh[:, 0] = actual_values[group]
+            totals[group] = np.where(has_prev, np.take_along_axis(candidates, best, axis=1) + actual_values[group][:, None], fresh)
+            targets[group] = np.where(has_prev, prevs[best // k] * k + best % k, -1)
+
+        endnodes = np.flatnonzero(ends == ends.max())
+        end_totals = totals[endnodes].ravel()
+        ranked = [e for e in np.argsort(-end_totals, kind='stable')[:k] if end_totals[e] > -np.inf]
+
+        vocabulary = self.scale.vocabulary()
+        results = []
+        for e in ranked:
+            path = []
+            entry = endnodes[e // k] * k + e % k
+            while entry >= 0:
+                path.append(entry)
+                entry = targets[entry // k, entry % k]
+
+            result = []
+            for entry in reversed(path):
+                node, rank = entry // k, entry % k
+                n = ChordNode(vocabulary[chord_ids[node]], float(values[node]), float(starts[node]), float(lengths[node]))
+                n.chord_id = int(chord_ids[node])
+                n.total_value = float(totals[node, rank])
+                n.target = result[-1] if result else None
+                result.append(n)
+            results.append(result)
+        return results
 
+
+@lru_cache(maxsize=None)
+def _pitch_class_categories(masks):
+    # category of every pitch class: index of the first mask containing it, or len(masks) when dissonant
+    categories = []
+    for pitch_class in range(12):
+        bit = 1 << pitch_class
+        categories.append(next((i for i, mask in enumerate(masks) if mask & bit), len(masks)))
+    return tuple(categories)
+
+
+def _score_melody(scale, melody, number, weight=None, score_consonance=1, score_fifth=0.5, score_primary=0.25, score_secondary=0.125, score_dissonance=-1):
     if weight is None:
         weight = [1] * len(melody)
-    
-    score = []
-    for key in melody:
-        note = key.note
-        if check_tuple(base[:2], note):
-            score.append(score_consonance)
-        elif check_tuple(base[2:], note):
-            score.append(score_fifth)
-        elif check_tuple(primary, note):
-            score.append(score_primary)
-        elif check_tuple(secondary, note):
-            score.append(score_secondary)
+
+    categories = _pitch_class_categories(scale.pitch_class_masks(number))
+    scores = (score_consonance, score_fifth, score_primary, score_secondary, score_dissonance)
+
+    weighted = []
+    weight_sum = []
+    for key, w in zip(melody, weight):
+        if key.note is None:
+            continue
+        weighted.append(scores[categories[key.note.pitch_class()]] * w)
+        weight_sum.append(w)
+
+    if not weighted:
+        return 0
+
+    return sum(weighted) / sum(weight_sum)
+
+
+def _slice_melody(melody, start, length):
+    end = start + length
+    for k in melody:
+        k_end = k.start + k.length
+        if k.start >= start and k_end <= end:
+            yield k
+        elif k.start >= start and k.start < end and k_end > end:
+            yield k.replace(length=start + length - k.start)
+        elif k.start < start and k_end > start and k_end <= end:
+            yield k.replace(start=start, length=k.start + k.length - start)
         else:
-            score.append(score_dissonance)
+            pass
 
-    return sum([s * w for s, w in zip(score, weight)]) / sum(weight)
 
+def _chord_weight_matrix(scale, numbers, score_consonance=1, score_fifth=0.5, score_primary=0.25, score_secondary=0.125, score_dissonance=-1):
+    # (12, len(numbers)) matrix holding the score of each pitch class against each chord
+    scores = np.array([score_consonance, score_fifth, score_primary, score_secondary, score_dissonance], dtype=float)
+    categories = [_pitch_class_categories(scale.pitch_class_masks(number)) for number in numbers]
+    return scores[np.array(categories, dtype=int).T]
 
-def _song_to_chord(song, scale, granularity=(1, 2, 4), 
-                   offset=0, cadence_at=16, cadence_score=1, restrictions=None):
 
-    melody = list(song.sing())
+class MelodyIndex:
+    # Keys sorted by start with parallel start/end arrays, so that the keys overlapping a window
+    # are found by binary search instead of scanning the whole melody.
+    def __init__(self, melody):
+        self.keys = sorted(melody, key=lambda k: k.start)
+        self.starts = np.array([k.start for k in self.keys], dtype=float)
+        self.lengths = np.array([k.length for k in self.keys], dtype=float)
+        self.ends = np.array([k.start + k.length for k in self.keys], dtype=float)
+        self.pitch_classes = np.array([-1 if k.note is None else k.note.pitch_class() for k in self.keys], dtype=int)
+        self.max_length = self.lengths.max() if self.keys else 0
 
-    def _slice_melody(melody, start, length):
-        end = start + length
-        for k in melody:
-            k_end = k.start + k.length
-            if k.start >= start and k_end <= end:
-                yield k
-            elif k.start >= start and k.start < end and k_end > end:
-                yield k.replace(length=start + length - k.start)
-            elif k.start < start and k_end > start and k_end <= end:
-                yield k.replace(start=start, length=k.start + k.length - start)
-            else:
-                pass
-    
-    time_max = int(max([k.start + k.length for k in melody]))
-    dag = ChordDag()
+    def slice(self, start, length):
+        # same keys as _slice_melody, only looking at keys that start within max_length of the window
+        low = int(np.searchsorted(self.starts, start - self.max_length, side='left'))
+        high = int(np.searchsorted(self.starts, start + length, side='right'))
+        return _slice_melody(self.keys[low:high], start, length)
+
+    def overlaps(self, starts, length):
+        # (window index, key index, clipped length) for every key touching each window, clipped like _slice_melody
+        window_starts = np.array(starts, dtype=float)
+        window_ends = np.array([start + length for start in starts], dtype=float)
+
+        first = np.searchsorted(window_ends, self.starts, side='left')
+        last = np.searchsorted(window_starts, self.ends, side='left')
+        window_index, key_index = _expand_ranges(first, last)
+
+        ws, we = window_starts[window_index], window_ends[window_index]
+        s, e = self.starts[key_index], self.ends[key_index]
+        inside = (s >= ws) & (e <= we)
+        tail = (s >= ws) & (s < we) & (e > we)
+        head = (s < ws) & (e > ws) & (e <= we)
+        weight = np.where(inside, self.lengths[key_index], 0.0)
+        weight = np.where(tail, we - s, weight)
+        weight = np.where(head, e - ws, weight)
+        return window_index, key_index, weight
+
+    def histograms(self, starts, length):
+        # duration-weighted pitch class histogram of every window
+        window_index, key_index, weight = self.overlaps(starts, length)
+        pitch_classes = self.pitch_classes[key_index]
+        sounding = pitch_classes >= 0
+        histograms = np.zeros((len(starts), 12))
+        np.add.at(histograms, (window_index[sounding], pitch_classes[sounding]), weight[sounding])
+        return histograms
+
+
+def _expand_ranges(first, last):
+    # (index in range, owner) pairs for every half-open range [first[i], last[i])
+    counts = np.maximum(last - first, 0)
+    owner = np.repeat(np.arange(len(counts)), counts)
+    index = np.repeat(first, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return index, owner
+
+
+def _score_histograms(histograms, weight_matrix):
+    total = histograms.sum(axis=1, keepdims=True)
+    scores = histograms @ weight_matrix
+    return np.divide(scores, total, out=np.zeros_like(scores), where=(total != 0))
+
+
+def _score_matrix(scale, melody, starts, length, numbers, score_weights=None):
+    # scores of every window against every number, equal to _score_melody on each sliced window
+    if not isinstance(melody, MelodyIndex):
+        melody = MelodyIndex(melody)
+    return _score_histograms(melody.histograms(starts, length), _chord_weight_matrix(scale, numbers, **(score_weights or {})))
+
+
+_NUMBER_ADVANTAGE = {
+    'i': 0.2,
+    'ii': -0.2,
+    'iii': -0.2,
+    'iv': 0.2,
+    'v': 0.2,
+    'vi': -0.2,
+    'vii': -0.2,
+    'v7/ii': -0.2,
+    'v7/iii': -0.2,
+    'v7/iv': -0.2,
+    'v7/v': -0.2,
+    'v7/vi': -0.2,
+    'v7/vii': -0.2,
+}
+
+
+def _add_windows(dag, index, scale, granularity, begin, time_max, 
+                 offset=0, cadence_at=16, cadence_score=1, restrictions=None, score_weights=None):
+    # scores every window of every granularity starting in [begin, time_max) and adds it to the dag
     numbers = scale.possible_numbers()
+    cadences = scale.possible_cadences()
+
+    number_advantage = { k: 0 for k in _NUMBER_ADVANTAGE }
+    advantage = np.array([number_advantage[number] for number in numbers], dtype=float)
+    non_cadence = np.array([number not in cadences for number in numbers], dtype=float)
 
-    number_advantage = {
-        'i': 0.2,
-        'ii': -0.2,
-        'iii': -0.2,
-        'iv': 0.2,
-        'v': 0.2,
-        'vi': -0.2,
-        'vii': -0.2,
-        'v7/ii': -0.2,
-        'v7/iii': -0.2,
-        'v7/iv': -0.2,
-        'v7/v': -0.2,
-        'v7/vi': -0.2,
-        'v7/vii': -0.2,
-    }
-    number_advantage = { k: 0 for k in number_advantage }
+    weight_matrix = _chord_weight_matrix(scale, numbers, **(score_weights or {}))
 
     for g in granularity:
-        timing = offset
+        timings = []
+        timing = offset + max(0, ceil((begin - offset) / g)) * g
         while timing < time_max:
-            if restrictions and timing in restrictions:
+            timings.append(timing)
+            timing += g
+        if not timings:
+            continue
+
+        scores = _score_histograms(index.histograms(timings, g), weight_matrix) + advantage
+        at_cadence = np.array([(timing + g - offset) % cadence_at == 0 for timing in timings], dtype=float)
+        scores -= at_cadence[:, None] * non_cadence[None, :] * cadence_score
+
+        # candidate numbers come first in the scale's vocabulary, so their chord ids are 0..len(numbers)-1
+        chord_ids = np.arange(len(numbers))
+        if not restrictions:
+            dag.add_nodes(np.tile(chord_ids, len(timings)), scores.ravel(), np.repeat(timings, len(numbers)), g)
+            continue
+        for timing, row in zip(timings, scores):
+            if timing in restrictions:
                 dag.add_node(restrictions[timing], 0, timing, g)
             else:
-                part = list(_slice_melody(melody, timing, g))
-                weight = _get_melody_weight(part)
-                scores = []
-                for number in numbers:
-                    score = _score_melody(scale, part, number, weight)
-                    score += number_advantage[number]
-                    if (timing + g - offset) % cadence_at == 0:
-                        if number not in scale.possible_cadences():
-                            score -= cadence_score
-                    scores.append((number, score))
-                for number, score in scores:
-                    dag.add_node(number, score, timing, g)
-            timing += g
+                dag.add_nodes(chord_ids, row, timing, g)
+
+
+def _song_to_chord(song, scale, granularity=(1, 2, 4), 
+                   offset=0, cadence_at=16, cadence_score=1, restrictions=None, k=None, 
+                   score_weights=None, cache=None):
+
+    melody = list(song.sing())
+
+    # results are roman numerals, so they are cached in tonic-relative form and shared by every key
+    if cache is not None:
+        key = content_key(
+            'song_to_chord', relative_melody_fingerprint(melody, scale.tonic), mode_fingerprint(scale), list(granularity), 
+            offset, cadence_at, cadence_score, restrictions or {}, k, score_weights or {},
+        )
+        paths = cache.get(key)
+        if paths is not None:
+            results = [_nodes_from_rows(rows) for rows in paths]
+            return results if k is not None else results[0]
     
-    return dag.solve(scale)
\ No newline at end of file
+    time_max = int(max([k.start + k.length for k in melody]))
+    dag = ArrayChordDag(scale)
+    _add_windows(
+        dag, MelodyIndex(melody), scale, granularity, offset, time_max, offset=offset, 
+        cadence_at=cadence_at, cadence_score=cadence_score, restrictions=restrictions, 
+        score_weights=score_weights,
+    )
+    results = dag.solve_k_best(k if k is not None else 1)
+
+    if cache is not None:
+        cache.put(key, [[(n.number, n.value, n.start, n.length, n.total_value) for n in nodes] for nodes in results])
+
+    return results if k is not None else results[0]
+
+
+def _nodes_from_rows(rows):
+    nodes = []
+    for number, value, start, length, total_value in rows:
+        n = ChordNode(number, value, start, length)
+        n.total_value = total_value
+        n.target = nodes[-1] if nodes else None
+        nodes.append(n)
+    return nodes
+
+
+def _common_period(granularity):
+    # smallest length every granularity divides; no window crosses a multiple of it from the offset
+    fractions = [Fraction(g) for g in granularity]
+    denominator = 1
+    for f in fractions:
+        denominator = denominator * f.denominator // gcd(denominator, f.denominator)
+    numerator = 1
+    for f in fractions:
+        n = f.numerator * (denominator // f.denominator)
+        numerator = numerator * n // gcd(numerator, n)
+    return Fraction(numerator, denominator)
+
+
+def _solve_chunk(task):
+    # runs in a worker process; returns plain rows so that only keys and rows cross the process boundary
+    keys, scale, granularity, begin, end, options = task
+    dag = ArrayChordDag(scale)
+    _add_windows(dag, MelodyIndex(keys), scale, granularity, begin, end, **options)
+    return [(n.number, n.value, n.start, n.length) for n in dag.solve()]
+
+
+def _path_value(rows, length_advantage=1.1):
+    return sum((length ** length_advantage) * value for number, value, start, length in rows)
+
+
+def _as_time(value):
+    return int(value) if value == int(value) else float(value)
+
+
+def _stitch(index, scale, granularity, left, right, lo, hi, options, strict=True):
+    # re-solves [lo, hi) between the left chord ending at lo and the right chord starting at hi;
+    # returns the rows replacing everything between them, or None if strict and the window cannot join them
+    seed = next((r for r in left if r[2] + r[3] == lo), None)
+    terminal = next((r for r in right if r[2] == hi), None)
+    dag = ArrayChordDag(scale)
+    if seed is not None:
+        dag.add_node(seed[0], 0, seed[2], seed[3])
+    _add_windows(dag, index, scale, granularity, lo, hi, **options)
+    if terminal is not None:
+        dag.add_node(*terminal)
+    nodes = dag.solve()
+    joined = (seed is None or nodes[0].start == seed[2]) and (terminal is None or (len(nodes) > 1 and nodes[-1].start == hi))
+    if strict and not joined:
+        return None
+    return [(n.number, n.value, n.start, n.length) for n in nodes if lo <= n.start < hi]
+
+
+def _song_to_chord_parallel(song, scale, granularity=(1, 2, 4), 
+                            offset=0, cadence_at=16, cadence_score=1, restrictions=None, score_weights=None, 
+                            phrases=4, overlap=8, executor=None):
+    # Splits the melody every `phrases` cadences, solves each chunk's dag in a process pool and stitches
+    # the chunk optima. Where two chunk paths cannot be joined, the overlap around the boundary is
+    # re-solved, widening until the chords on both sides connect. Returns (nodes, gap): the sum of the
+    # unconstrained chunk optima bounds the single-dag optimum, so it lies within gap above the result.
+    melody = list(song.sing())
+    time_max = int(max([k.start + k.length for k in melody]))
+    chunk_length = Fraction(cadence_at) * phrases
+    period = _common_period(granularity)
+    if chunk_length % period:
+        raise ValueError('chunks of {} beats would split windows of {}'.format(chunk_length, list(granularity)))
+
+    edges = [offset]
+    while edges[-1] + chunk_length < time_max:
+        edges.append(_as_time(edges[-1] + chunk_length))
+    edges.append(time_max)
+
+    options = dict(offset=offset, cadence_at=cadence_at, cadence_score=cadence_score, restrictions=restrictions, score_weights=score_weights)
+    tasks = [
+        ([k for k in melody if k.start < end + max(granularity) and k.start + k.length > begin], scale, granularity, begin, end, options)
+        for begin, end in zip(edges, edges[1:])
+    ]
+    if executor is not None:
+        chunks = list(executor.map(_solve_chunk, tasks))
+    elif len(tasks) > 1:
+        with ProcessPoolExecutor() as pool:
+            chunks = list(pool.map(_solve_chunk, tasks))
+    else:
+        chunks = [_solve_chunk(tasks[0])]
+    upper_bound = sum(_path_value(rows) for rows in chunks)
+
+    index = MelodyIndex(melody)
+    rows = list(chunks[0])
+    for i, right in enumerate(chunks[1:], 1):
+        boundary = edges[i]
+        if rows[-1][2] + rows[-1][3] == right[0][2] == boundary and scale.is_transitable(rows[-1][0], right[0][0]):
+            rows += right
+            continue
+
+        # the window is aligned to the period, so both paths have a chord boundary at its edges
+        width = ceil(Fraction(overlap) / period) * period
+        while True:
+            lo = _as_time(max(offset, boundary - width))
+            hi = edges[i + 1] if boundary + width >= edges[i + 1] else _as_time(boundary + width)
+            widest = lo == offset and hi == edges[i + 1]
+            middle = _stitch(index, scale, granularity, rows, right, lo, hi, options, strict=not widest)
+            if middle is not None:
+                break
+            width *= 2
+        rows = [r for r in rows if r[2] + r[3] <= lo] + middle + [r for r in right if r[2] >= hi]
+
+    total, result = 0, []
+    for number, value, start, length in rows:
+        total += (length ** 1.1) * value
+        result.append((number, value, start, length, total))
+    return _nodes_from_rows(result), max(0.0, upper_bound - total)
+
+
+class OnlineReharmonizer:
+    # Reharmonizes a melody that grows one key at a time. Chords ending more than `lag` beats before
+    # the end of the melody are committed and never revisited; each append only re-solves the
+    # uncommitted tail, seeded with the last committed chord, so its cost does not grow with the tune.
+    def __init__(self, scale, granularity=(1, 2, 4), lag=8, 
+                 offset=0, cadence_at=16, cadence_score=1, restrictions=None, score_weights=None):
+        self.scale = scale
+        self.granularity = granularity
+        self.lag = lag
+        self.offset = offset
+        self.cadence_at = cadence_at
+        self.cadence_score = cadence_score
+        self.restrictions = restrictions
+        self.score_weights = score_weights
+        self.keys = []
+        self.ends = []
+        self.time = 0
+        self.committed = []
+        self.pending = []
+
+    def append(self, key):
+        # the key is placed at the current end of the melody, like the children of Enumerate
+        key = key.replace(start=self.time)
+        self.keys.append(key)
+        self.time = key.start + key.length
+        self.ends.append(self.time)
+        return self._update()
+
+    def pop(self):
+        key = self.keys.pop()
+        self.ends.pop()
+        self.time = key.start
+        # committed chords overlapping the removed key are no longer final
+        while self.committed and self.committed[-1].start + self.committed[-1].length > key.start:
+            self.committed.pop()
+        self._update()
+        return key
+
+    def progression(self):
+        return self.committed + self.pending
+
+    def _update(self):
+        committed_at = self.committed[-1].start + self.committed[-1].length if self.committed else self.offset
+        time_max = int(self.time)
+        if time_max <= committed_at:
+            self.pending = []
+            return []
+
+        # keys ending at or before the commit point cannot touch the remaining windows
+        tail = self.keys[bisect_right(self.ends, committed_at):]
+        dag = ArrayChordDag(self.scale)
+        if self.committed:
+            seed = self.committed[-1]
+            dag.add_node(seed.number, 0, seed.start, seed.length)
+        _add_windows(
+            dag, MelodyIndex(tail), self.scale, self.granularity, committed_at, time_max, offset=self.offset, 
+            cadence_at=self.cadence_at, cadence_score=self.cadence_score, restrictions=self.restrictions, 
+            score_weights=self.score_weights,
+        )
+        nodes = [n for n in dag.solve() if n.start >= committed_at]
+
+        newly_committed = []
+        while nodes and nodes[0].start + nodes[0].length <= self.time - self.lag:
+            newly_committed.append(nodes.pop(0))
+        self.committed += newly_committed
+        self.pending = nodes
+        return newly_committed
+
+
+if __name__ == '__main__':
+    import unittest
+    from .note import MajorScale, NaturalMinorScale
+    from .singable import Key, Enumerate
+
+    class TestScoreMatrix(unittest.TestCase):
+
+        def test_matches_score_melody(self):
+            melody = list(Enumerate()([
+                Key(length=1.5, note=Note('E5')),
+                Key(length=1/2, note=Note('D5')),
+                Key(length=1, note=None),
+                Key(length=3, note=Note('G4')),
+                Key(length=1/2, note=Note('F#5')),
+                Key(length=1/2, note=Note('B4')),
+                Key(length=1, note=Note('C5')),
+            ]).sing())
+            for scale in [MajorScale(tonic=Note('C5')), NaturalMinorScale(tonic=Note('E4'))]:
+                numbers = scale.possible_numbers()
+                for length in (1, 2, 4):
+                    starts = list(range(0, 8, length))
+                    matrix = _score_matrix(scale, melody, starts, length, numbers)
+                    for i, start in enumerate(starts):
+                        part = list(_slice_melody(melody, start, length))
+                        for j, number in enumerate(numbers):
+                            expected = _score_melody(scale, part, number, _get_melody_weight(part))
+                            self.assertAlmostEqual(matrix[i, j], expected)
+
+        def test_array_solver(self):
+            import random
+            rnd = random.Random(0)
+            for scale in [MajorScale(tonic=Note('C5')), NaturalMinorScale(tonic=Note('E4'))]:
+                numbers = scale.possible_numbers()
+                dag, array_dag = ChordDag(), ArrayChordDag(scale)
+                for g in (1, 2, 4):
+                    for timing in range(0, 16, g):
+                        for number in numbers:
+                            value = rnd.choice([-1, -0.5, 0, 0.25, 0.5, 1])
+                            dag.add_node(number, value, timing, g)
+                            array_dag.add_node(number, value, timing, g)
+                expected = [(n.number, n.start, n.length, n.total_value) for n in dag.solve(scale)]
+                actual = [(n.number, n.start, n.length, n.total_value) for n in array_dag.solve()]
+                self.assertEqual(actual, expected)
+
+        def test_k_best(self):
+            import random
+            from itertools import product
+            rnd = random.Random(2)
+            scale = MajorScale(tonic=Note('C5'))
+            numbers = scale.possible_numbers()
+            dag = ArrayChordDag(scale)
+            values = {}
+            for g in (1, 2):
+                for timing in range(0, 4, g):
+                    for number in numbers:
+                        values[(number, timing, g)] = rnd.random()
+                        dag.add_node(number, values[(number, timing, g)], timing, g)
+
+            # brute force over every segmentation of 4 beats into the 1 and 2 beat windows
+            totals = []
+            for split in [(1, 1, 1, 1), (2, 1, 1), (1, 1, 2), (2, 2)]:
+                windows = [(sum(split[:i]), g) for i, g in enumerate(split)]
+                for chords in product(numbers, repeat=len(windows)):
+                    if all(scale.is_transitable(a, b) for a, b in zip(chords, chords[1:])):
+                        totals.append(sum([(g ** 1.1) * values[(c, t, g)] for c, (t, g) in zip(chords, windows)]))
+            totals = sorted(totals, reverse=True)
+
+            results = dag.solve_k_best(10)
+            self.assertEqual(len(results), 10)
+            for result, total in zip(results, totals):
+                self.assertAlmostEqual(result[-1].total_value, total)
+                self.assertTrue(all(scale.is_transitable(a.number, b.number) for a, b in zip(result, result[1:])))
+
+        def test_online(self):
+            import random
+            rnd = random.Random(3)
+            keys = [
+                Key(length=rnd.choice([1/2, 1, 1, 2]), note=rnd.choice([None, Note('C5'), Note('D5'), Note('E5'), Note('G4'), Note('A4')]))
+                for _ in range(48)
+            ]
+            scale = MajorScale(tonic=Note('C5'))
+            expected = [(n.number, n.start, n.length) for n in _song_to_chord(Enumerate()(keys), scale)]
+
+            unbounded, lagged = OnlineReharmonizer(scale, lag=float('inf')), OnlineReharmonizer(scale, lag=4)
+            for key in keys:
+                unbounded.append(key)
+                lagged.append(key)
+            self.assertEqual([(n.number, n.start, n.length) for n in unbounded.progression()], expected)
+            self.assertFalse(unbounded.committed)
+
+            progression = lagged.progression()
+            self.assertTrue(lagged.committed)
+            self.assertEqual(progression[0].start, 0)
+            self.assertGreaterEqual(progression[-1].start + progression[-1].length, int(lagged.time))
+            for a, b in zip(progression, progression[1:]):
+                self.assertEqual(a.start + a.length, b.start)
+
+            popped = lagged.pop()
+            self.assertEqual(lagged.time, popped.start)
+            self.assertTrue(all(n.start + n.length <= popped.start for n in lagged.committed))
+
+        def test_cache(self):
+            import tempfile
+            from .cache import ReharmonizationCache
+            song = Enumerate()([Key(length=1, note=Note(n)) for n in ['C5', 'E5', 'G5', 'F5', 'D5', 'B4', 'C5', 'C5']])
+            scale = MajorScale(tonic=Note('C5'))
+            expected = [(n.number, n.start, n.length, n.total_value) for n in _song_to_chord(song, scale)]
+            with tempfile.TemporaryDirectory() as directory:
+                cache = ReharmonizationCache(directory=directory)
+                for _ in range(2):
+                    self.assertEqual([(n.number, n.start, n.length, n.total_value) for n in _song_to_chord(song, scale, cache=cache)], expected)
+                self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+                cache = ReharmonizationCache(directory=directory)
+                self.assertEqual([(n.number, n.start, n.length, n.total_value) for n in _song_to_chord(song, scale, cache=cache)], expected)
+                self.assertEqual(cache.hits, 1)
+                _song_to_chord(song, scale, cache=cache, score_weights={ 'score_fifth': 0.75 })
+                self.assertEqual(cache.misses, 1)
+
+        def test_cache_mode_fingerprint(self):
+            from .cache import ReharmonizationCache
+            from .singable import Transpose
+            from .note import scale_mode
+            song = Enumerate()([Key(length=1, note=Note(n)) for n in ['C5', 'E5', 'G5', 'F5', 'D5', 'B4', 'C5', 'C5']])
+            dorian = scale_mode('Custom', (2, 1, 2, 2, 2, 1, 2))(tonic=Note('C5'))
+            lydian = scale_mode('Custom', (2, 2, 2, 1, 2, 2, 1))(tonic=Note('C5'))
+            cache = ReharmonizationCache()
+            for scale in (dorian, lydian):
+                expected = [(n.number, n.start, n.length, n.total_value) for n in _song_to_chord(song, scale)]
+                self.assertEqual([(n.number, n.start, n.length, n.total_value) for n in _song_to_chord(song, scale, cache=cache)], expected)
+            self.assertEqual((cache.hits, cache.misses), (0, 2))
+            _song_to_chord(song, scale_mode('Custom', (2, 2, 2, 1, 2, 2, 1))(tonic=Note('D5')), cache=cache)
+            self.assertEqual(cache.hits, 0)
+            _song_to_chord(Transpose(Interval('M2'))(song), scale_mode('Custom', (2, 2, 2, 1, 2, 2, 1))(tonic=Note('D5')), cache=cache)
+            self.assertEqual(cache.hits, 1)
+
+        def test_parallel(self):
+            import random
+            rnd = random.Random(5)
+            keys = [
+                Key(length=rnd.choice([1/2, 1, 1, 2]), note=rnd.choice([None, Note('C5'), Note('D5'), Note('E5'), Note('G4'), Note('A4'), Note('F#5')]))
+                for _ in range(160)
+            ]
+            song = Enumerate()(keys)
+            scale = MajorScale(tonic=Note('C5'))
+            optimum = _song_to_chord(song, scale)[-1].total_value
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                nodes, gap = _song_to_chord_parallel(song, scale, phrases=1, executor=pool)
+            self.assertEqual(nodes[0].start, 0)
+            for a, b in zip(nodes, nodes[1:]):
+                self.assertEqual(a.start + a.length, b.start)
+                self.assertTrue(scale.is_transitable(a.number, b.number))
+            self.assertLessEqual(nodes[-1].total_value, optimum + 1e-9)
+            self.assertGreaterEqual(nodes[-1].total_value + gap, optimum - 1e-9)
+            self.assertAlmostEqual(nodes[-1].total_value, optimum)
+
+            with self.assertRaises(ValueError):
+                _song_to_chord_parallel(song, scale, granularity=(3,), phrases=1)
+
+        def test_transposition_invariance(self):
+            from .singable import Transpose
+            from .cache import ReharmonizationCache
+            from .note import Interval
+            song = Enumerate()([
+                Key(length=1, note=Note(n)) for n in ['E5', 'G#5', 'B5', 'A5', 'F#5', 'D#5', 'E5', 'C5', 'A4', 'F5', 'D5', 'E5']
+            ])
+            cache = ReharmonizationCache()
+            for cls in (MajorScale, NaturalMinorScale):
+                for interval in ['P1', 'm2', 'M3', 'A4', 'd5', 'm6', '-M2', '-m3', '-P8']:
+                    scale = cls(tonic=Note('E4') + Interval(interval))
+                    transposed = Transpose(Interval(interval))(song)
+                    expected = [(n.number, n.start, n.length, n.total_value) for n in _song_to_chord(transposed, scale)]
+                    actual = [(n.number, n.start, n.length, n.total_value) for n in _song_to_chord(transposed, scale, cache=cache)]
+                    self.assertEqual(actual, expected)
+            self.assertEqual(cache.misses, 2)
+
+        def test_melody_index(self):
+            melody = list(Enumerate()([
+                Key(length=3, note=Note('C5')),
+                Key(length=1/2, note=Note('D5')),
+                Key(length=0, note=Note('E5')),
+                Key(length=1.5, note=Note('F5')),
+                Key(length=1, note=None),
+                Key(length=2.5, note=Note('G5')),
+            ]).sing()) + [Key(start=1, length=6, note=Note('A4'))]
+            index = MelodyIndex(melody)
+            for length in (1/2, 1, 2, 4):
+                for start in [x / 2 for x in range(0, 20)]:
+                    sliced = lambda keys: sorted([(k.start, k.length, str(k.note)) for k in keys])
+                    self.assertEqual(sliced(index.slice(start, length)), sliced(_slice_melody(melody, start, length)))
+
+
+    unittest.main()
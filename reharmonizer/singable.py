@@ -1,14 +1,195 @@
 from mido import Message, MidiFile, MidiTrack, MetaMessage, bpm2tempo
 from math import floor
-from .note import Note, Interval
+from .note import Note, Interval, NoteArray, Scale, _intern_note
+from collections import OrderedDict
+from contextvars import ContextVar
+import sys
+import numpy as np
 
 
 class Singable:
+    # empty slots keep slotted subclasses such as Key free of a __dict__
+    __slots__ = ()
+
     def messages(self):
         raise NotImplementedError
 
+    def render(self):
+        # columnar counterpart of sing(); singables without a vectorized path render their keys
+        return EventBuffer.from_keys(self.sing())
+
+
+def render(singable):
+    return _render(singable)
+
+
+def _child_singables(node):
+    # the singables a node evaluates, in graph order; nodes built on the fly while singing are not included
+    if isinstance(node, (Key, EventBuffer)):
+        return []
+    children = getattr(node, 'children', None)
+    if isinstance(children, (list, tuple)):
+        return [c for cl in children for c in (cl if isinstance(cl, (list, tuple)) else [cl])]
+    return [getattr(node, a) for a in ('child', 'chord', 'pattern') if isinstance(getattr(node, a, None), Singable)]
+
+
+_PLAIN_TYPES = (type(None), bool, int, float, str)
+
+
+def _attributes(node):
+    # instance attributes of a node, whether they live in its __dict__ or in slots
+    attributes = dict(getattr(node, '__dict__', {}))
+    for cls in type(node).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        for name in [slots] if isinstance(slots, str) else slots:
+            if name not in ('__dict__', '__weakref__') and hasattr(node, name):
+                attributes[name] = getattr(node, name)
+    return attributes
+
+
+def _fingerprint(value, memo, table):
+    # structural identity: equal fingerprints sing equal keys. Notes and intervals are compared by
+    # spelling, not by the enharmonic equality of Note and Interval; anything opaque (functions, caches,
+    # buffers) only matches itself. Singables are numbered through table, so a node's fingerprint holds
+    # its children's numbers and is hashed once rather than once per ancestor.
+    if isinstance(value, Singable) and not isinstance(value, Key):
+        if id(value) not in memo:
+            if isinstance(value, EventBuffer):
+                fingerprint = ('id', id(value))
+            else:
+                fingerprint = (type(value),) + tuple(
+                    (name, _fingerprint(v, memo, table)) for name, v in sorted(_attributes(value).items()))
+            memo[id(value)] = table.setdefault(fingerprint, len(table))
+        return memo[id(value)]
+    elif isinstance(value, Key):
+        return ('Key',) + tuple(v if type(v) in _PLAIN_TYPES else _fingerprint(v, memo, table) for v in value)
+    elif isinstance(value, Note):
+        return ('Note', value.step, value.midi)
+    elif isinstance(value, Interval):
+        return ('Interval', value.number, value.quality, value.inverted)
+    elif isinstance(value, Scale):
+        return (type(value), _fingerprint(value.tonic, memo, table))
+    elif isinstance(value, (list, tuple)):
+        return tuple(_fingerprint(v, memo, table) for v in value)
+    elif isinstance(value, dict):
+        return ('dict',) + tuple(sorted(((repr(k), _fingerprint(v, memo, table)) for k, v in value.items()), key=lambda item: item[0]))
+    elif isinstance(value, _PLAIN_TYPES):
+        return value
+    return ('id', id(value))
+
+
+class RenderContext:
+    # While active, every subgraph appearing more than once in the graph - the same node reached twice
+    # or structurally equal nodes - is evaluated once and its keys are replayed to later consumers.
+    # Materialized subgraphs are kept in an LRU bounded by max_events; evicted ones are evaluated again.
+    # The active context is held in a context variable, so threads rendering other graphs do not see it.
+    #
+    #     with RenderContext(song):
+    #         keys = list(song.sing())
+    def __init__(self, singable, max_events=1000000):
+        self.singable = singable
+        self.max_events = max_events
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._token = None
+
+        # uses of every subgraph by its distinct parents; a parent reached along several paths, or
+        # equal to one already visited, is evaluated once and so only counts its children once
+        memo = {}
+        table = {}
+        counts = {}
+        nodes = {}
+        visited = set()
+        stack = [singable]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (Key, EventBuffer)) or id(node) in nodes:
+                continue
+            fingerprint = nodes[id(node)] = _fingerprint(node, memo, table)
+            if fingerprint in visited:
+                continue
+            visited.add(fingerprint)
+            # Harmonize sings its child twice
+            uses = 2 if isinstance(node, _Harmonize) else 1
+            for child in _child_singables(node):
+                if not isinstance(child, (Key, EventBuffer)):
+                    key = _fingerprint(child, memo, table)
+                    counts[key] = counts.get(key, 0) + uses
+                    stack.append(child)
+        self.shared = { i: f for i, f in nodes.items() if counts.get(f, 0) > 1 }
+
+    def __enter__(self):
+        self._token = _context.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _context.reset(self._token)
+        return False
+
+    def _lookup(self, node, evaluate):
+        # one entry per subgraph, holding key fields if it was first sung or a buffer if first rendered
+        fingerprint = self.shared.get(id(node))
+        if fingerprint is None:
+            return None
+        if fingerprint in self.entries:
+            self.entries.move_to_end(fingerprint)
+            self.hits += 1
+            return self.entries[fingerprint]
+        self.misses += 1
+        value = evaluate()
+        if len(value) <= self.max_events:
+            self.entries[fingerprint] = value
+            self.size += len(value)
+            while self.size > self.max_events:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+        return value
+
+    def sing(self, node):
+        value = self._lookup(node, lambda: [tuple(k) for k in node.sing()])
+        if value is None:
+            return node.sing()
+        elif isinstance(value, EventBuffer):
+            return value.sing()
+        return (Key(*e) for e in value)
+
+    def render(self, node):
+        value = self._lookup(node, node.render)
+        if value is None:
+            return node.render()
+        elif isinstance(value, EventBuffer):
+            return value
+        return EventBuffer.from_keys(Key(*e) for e in value)
+
+    def info(self):
+        return { 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': self.size, 'shared': len(self.shared) }
+
+
+_context = ContextVar('render_context', default=None)
+
+
+def _sing(node):
+    context = _context.get()
+    if context is None:
+        return node.sing()
+    return context.sing(node)
+
+
+def _render(node):
+    context = _context.get()
+    if context is None:
+        return node.render()
+    return context.render(node)
+
 
 class Key(Singable):
+    # slotted so that the millions of keys in a large render carry no __dict__; fields iterate like a tuple
+    __slots__ = ('start', 'length', 'note', 'channel', 'velocity')
+
     def __init__(self, start=0, length=0, note=None, channel=0, velocity=0.75):
         self.start = start
         self.length = length
@@ -16,6 +197,12 @@ class Key(Singable):
         self.channel = channel
         self.velocity = velocity
 
+    def __iter__(self):
+        return iter((self.start, self.length, self.note, self.channel, self.velocity))
+
+    def __repr__(self):
+        return 'Key(start={!r}, length={!r}, note={!r}, channel={!r}, velocity={!r})'.format(*self)
+
     def replace(self, start=None, length=None, note=None, channel=None, velocity=None):
         return Key(
             start=self.start if start is None else start, 
@@ -28,6 +215,74 @@ class Key(Singable):
     def sing(self):
         yield self
 
+    def render(self):
+        return EventBuffer.from_keys([self])
+
+
+class EventBuffer(Singable):
+    # Keys as parallel numpy columns: start, length, spelled note (diatonic step and midi number, see
+    # NoteArray), rest flag, channel and velocity. Rows of rests keep a step and midi of 0.
+    # A buffer is itself a singable, so everything taking a singable takes a buffer as well.
+    __slots__ = ('start', 'length', 'step', 'midi', 'rest', 'channel', 'velocity')
+
+    def __init__(self, start, length, step, midi, rest, channel, velocity):
+        self.start = np.asarray(start, dtype=float)
+        self.length = np.asarray(length, dtype=float)
+        self.step = np.asarray(step, dtype=np.int64)
+        self.midi = np.asarray(midi, dtype=np.int64)
+        self.rest = np.asarray(rest, dtype=bool)
+        self.channel = np.asarray(channel, dtype=np.int64)
+        self.velocity = np.asarray(velocity, dtype=float)
+
+    @staticmethod
+    def from_keys(keys):
+        keys = list(keys)
+        return EventBuffer(
+            [k.start for k in keys],
+            [k.length for k in keys],
+            [0 if k.note is None else k.note.step for k in keys],
+            [0 if k.note is None else k.note.midi for k in keys],
+            [k.note is None for k in keys],
+            [k.channel for k in keys],
+            [k.velocity for k in keys],
+        )
+
+    @staticmethod
+    def concatenate(buffers):
+        buffers = list(buffers)
+        if not buffers:
+            return EventBuffer.from_keys([])
+        return EventBuffer(*[np.concatenate([getattr(b, column) for b in buffers]) for column in EventBuffer.__slots__])
+
+    def replace(self, **columns):
+        # new buffer sharing every column not given; columns are never written in place
+        return EventBuffer(*[columns[c] if c in columns else getattr(self, c) for c in EventBuffer.__slots__])
+
+    def take(self, rows):
+        return EventBuffer(*[getattr(self, c)[rows] for c in EventBuffer.__slots__])
+
+    @property
+    def notes(self):
+        return NoteArray.from_arrays(self.step, self.midi)
+
+    @property
+    def end(self):
+        return self.start + self.length
+
+    def __len__(self):
+        return len(self.start)
+
+    def sing(self):
+        columns = zip(
+            self.start.tolist(), self.length.tolist(), self.step.tolist(), self.midi.tolist(),
+            self.rest.tolist(), self.channel.tolist(), self.velocity.tolist(),
+        )
+        for start, length, step, midi, rest, channel, velocity in columns:
+            yield Key(start, length, None if rest else _intern_note(step, midi), channel, velocity)
+
+    def render(self):
+        return self
+
 
 def MultiKey(start=0, length=0, notes=None, channel=0, velocity=0.75):
     return [Key(start=start, length=length, note=note, channel=channel, velocity=velocity) for note in notes]
@@ -37,6 +292,8 @@ def parameter_graphmaker(cls):
     def _graphmaker(*arg, **kwargs):
         def _singablemaker(x):
             return cls(x, *arg, **kwargs)
+        # lets render() tell operator factories from arbitrary functions of a key
+        _singablemaker.singable_class = cls
         return _singablemaker
     return _graphmaker
 
@@ -47,9 +304,12 @@ class _Parallel(Singable):
 
     def sing(self):
         for c in self.children:
-            for mm in c.sing():
+            for mm in _sing(c):
                 yield mm
 
+    def render(self):
+        return EventBuffer.concatenate([_render(c) for c in self.children])
+
 
 class _Enumerate(Singable):
     def __init__(self, children, interval=None):
@@ -71,6 +331,25 @@ class _Enumerate(Singable):
             else:
                 time = time_max
 
+    def render(self):
+        buffers = []
+        time = 0
+        for cl in self.children:
+            time_max = 0
+            if not isinstance(cl, (list, tuple)):
+                cl = [cl]
+            for c in cl:
+                buffer = _render(c)
+                buffer = buffer.replace(start=buffer.start + time)
+                if len(buffer):
+                    time_max = max(float(buffer.end.max()), time_max)
+                buffers.append(buffer)
+            if self.interval:
+                time += self.interval
+            else:
+                time = time_max
+        return EventBuffer.concatenate(buffers)
+
 
 class _Repeat(Singable):
     def __init__(self, child, repeat_num, interval=None):
@@ -90,6 +369,23 @@ class _Repeat(Singable):
             else:
                 time = time_max
 
+    def render(self):
+        # the child is rendered once and tiled at the offsets sing() would shift it by
+        child = _render(self.child)
+        offsets = []
+        time = 0
+        time_max = 0
+        for _ in range(self.repeat_num):
+            offsets.append(time)
+            if len(child):
+                time_max = max(float((child.start + time + child.length).max()), time_max)
+            if self.interval:
+                time += self.interval
+            else:
+                time = time_max
+        tiled = child.take(np.tile(np.arange(len(child)), len(offsets)))
+        return tiled.replace(start=tiled.start + np.repeat(np.array(offsets, dtype=float), len(child)))
+
 
 
 class _SelectTime(Singable):
@@ -100,7 +396,7 @@ class _SelectTime(Singable):
         self.func = func
 
     def sing(self):
-        for key in self.child.sing():
+        for key in _sing(self.child):
             if key.start >= self.start and key.start < self.start + self.length:
                 for k in self.func(key).sing():
                     yield k
@@ -116,7 +412,7 @@ class _SelectInterval(Singable):
         self.outliers = outliers
 
     def sing(self):
-        for key in self.child.sing():
+        for key in _sing(self.child):
             ind = key.start // self.interval
             if ind < 0 or ind >= len(self.funcs):
                 if self.outliers == 'loop':
@@ -128,6 +424,40 @@ class _SelectInterval(Singable):
             for k in self.funcs[ind](key).sing():
                 yield k
 
+    def render(self):
+        buffer = _render(self.child)
+        index = np.floor_divide(buffer.start, self.interval).astype(np.int64)
+        rows = np.arange(len(buffer))
+        count = len(self.funcs)
+        if self.outliers == 'loop':
+            index = index % count
+        elif self.outliers == 'clip':
+            index = np.clip(index, 0, count - 1)
+        elif self.outliers == 'none' or self.outliers is None:
+            keep = (index >= 0) & (index < count)
+            index, rows = index[keep], rows[keep]
+
+        # every output row is tagged with the input row it came from, so that a stable sort restores
+        # the order sing() yields in
+        pieces, sources = [], []
+        for i in np.unique(index).tolist():
+            func = self.funcs[i]
+            selected = rows[index == i]
+            if issubclass(getattr(func, 'singable_class', type(None)), _KeyMap):
+                # a per-key operator made by its graphmaker, applied to the whole selection at once
+                pieces.append(func(buffer.take(selected)).render())
+                sources.append(selected)
+                continue
+            # any other function may read the key's fields, so it sees one key at a time, as in sing()
+            for row, key in zip(selected.tolist(), buffer.take(selected).sing()):
+                out = EventBuffer.from_keys(func(key).sing())
+                pieces.append(out)
+                sources.append(np.full(len(out), row))
+        if not pieces:
+            return buffer.take(rows)
+        order = np.argsort(np.concatenate(sources), kind='stable')
+        return EventBuffer.concatenate(pieces).take(order)
+
 
 class _SelectIndex(Singable):
     def __init__(self, child, istart, ilength, func):
@@ -137,7 +467,7 @@ class _SelectIndex(Singable):
         self.func = func
 
     def sing(self):
-        for i, key in enumerate(self.child.sing()):
+        for i, key in enumerate(_sing(self.child)):
             if i >= self.istart and i < self.istart + self.ilength:
                 for k in self.func(key).sing():
                     yield k
@@ -145,70 +475,128 @@ class _SelectIndex(Singable):
                 yield key
 
 
-class _ShiftTime(Singable):
+class _KeyMap(Singable):
+    # Operators turning every key of the child into exactly one key. A chain of them is run as one
+    # transform: each input key's fields go through every operator's map() and a single Key comes
+    # out, instead of one intermediate Key per operator.
+    def map(self, start, length, note, channel, velocity):
+        raise NotImplementedError
+
+    def apply(self, buffer):
+        # vectorized map() over every row of a buffer
+        raise NotImplementedError
+
+    def chain(self):
+        # the first singable below the chain and the operators to apply to its keys, innermost first;
+        # the chain stops at nodes the active RenderContext shares so that they are evaluated through it
+        context = _context.get()
+        shared = context.shared if context is not None else {}
+        nodes = []
+        node = self
+        while isinstance(node, _KeyMap) and (node is self or id(node) not in shared):
+            nodes.append(node)
+            node = node.child
+        nodes.reverse()
+        return node, nodes
+
+    def sing(self):
+        source, nodes = self.chain()
+        maps = [n.map for n in nodes]
+        for key in _sing(source):
+            fields = (key.start, key.length, key.note, key.channel, key.velocity)
+            for m in maps:
+                fields = m(*fields)
+            yield Key(*fields)
+
+    def render(self):
+        source, nodes = self.chain()
+        buffer = _render(source)
+        for n in nodes:
+            buffer = n.apply(buffer)
+        return buffer
+
+
+class _ShiftTime(_KeyMap):
     def __init__(self, child, time):
         self.child = child
         self.time = time
 
-    def sing(self):
-        for key in self.child.sing():
-            yield key.replace(start=key.start + self.time)
+    def map(self, start, length, note, channel, velocity):
+        return start + self.time, length, note, channel, velocity
 
+    def apply(self, buffer):
+        return buffer.replace(start=buffer.start + self.time)
 
-class _Lengthen(Singable):
+
+class _Lengthen(_KeyMap):
     def __init__(self, child, scale):
         self.child = child
         self.scale = scale
 
-    def sing(self):
-        for key in self.child.sing():
-            yield key.replace(start=max(0, key.length * self.scale))
+    def map(self, start, length, note, channel, velocity):
+        return max(0, length * self.scale), length, note, channel, velocity
+
+    def apply(self, buffer):
+        return buffer.replace(start=np.maximum(0, buffer.length * self.scale))
 
 
-class _Longify(Singable):
+class _Longify(_KeyMap):
     def __init__(self, child, time):
         self.child = child
         self.time = time
 
-    def sing(self):
-        for key in self.child.sing():
-            yield key.replace(start=max(0, key.length + self.time))
+    def map(self, start, length, note, channel, velocity):
+        return max(0, length + self.time), length, note, channel, velocity
+
+    def apply(self, buffer):
+        return buffer.replace(start=np.maximum(0, buffer.length + self.time))
 
 
-class _Amplify(Singable):
+class _Amplify(_KeyMap):
     def __init__(self, child, magnitude):
         self.child = child
         self.magnitude = magnitude
 
-    def sing(self):
-        for key in self.child.sing():
-            yield key.replace(velocity=key.velocity * self.magnitude)
+    def map(self, start, length, note, channel, velocity):
+        return start, length, note, channel, velocity * self.magnitude
 
+    def apply(self, buffer):
+        return buffer.replace(velocity=buffer.velocity * self.magnitude)
 
-class _Transpose(Singable):
+
+class _Transpose(_KeyMap):
     def __init__(self, child, transpose):
         self.child = child
         self.transpose = transpose
 
-    def sing(self):
-        for key in self.child.sing():
-            yield key.replace(note=key.note + self.transpose)
+    def map(self, start, length, note, channel, velocity):
+        return start, length, note + self.transpose, channel, velocity
+
+    def apply(self, buffer):
+        # rests stay rests
+        notes = buffer.notes + self.transpose
+        return buffer.replace(step=np.where(buffer.rest, 0, notes.steps), midi=np.where(buffer.rest, 0, notes.midis))
 
 
-class _Bound(Singable):
+_OCTAVE = Interval('P8')
+
+
+class _Bound(_KeyMap):
     def __init__(self, child, low, high):
         self.child = child
         self.high = high
         self.low = low
 
-    def sing(self):
-        for key in self.child.sing():
-            target_note = key.note
-            while target_note > self.high:
-                target_note -= Interval('P8')
-            while target_note < self.low:
-                target_note += Interval('P8')
-            yield key.replace(note=target_note)
+    def map(self, start, length, note, channel, velocity):
+        while note > self.high:
+            note -= _OCTAVE
+        while note < self.low:
+            note += _OCTAVE
+        return start, length, note, channel, velocity
+
+    def apply(self, buffer):
+        notes = buffer.notes.bound(self.low, self.high)
+        return buffer.replace(step=np.where(buffer.rest, 0, notes.steps), midi=np.where(buffer.rest, 0, notes.midis))
 
 
 class _Harmonize(Singable):
@@ -217,50 +605,70 @@ class _Harmonize(Singable):
         self.transpose = transpose
 
     def sing(self):
-        for key1, key2 in zip(self.child.sing(), Transpose(self.transpose)(self.child).sing()):
+        for key1, key2 in zip(_sing(self.child), Transpose(self.transpose)(self.child).sing()):
             yield key1
             yield key2
 
 
-class _Swing(Singable):
+class _Swing(_KeyMap):
     def __init__(self, child, interval, rate):
         self.child = child
         self.interval = interval
         self.rate = rate
 
-    def sing(self):
-        for key in self.child.sing():
-            def _swing_time(time):
-                index = floor(time / self.interval)
-                frac = (time / self.interval - index)
-                if frac < 0.5:
-                    frac = frac / 0.5 * self.rate
-                else:
-                    frac = 1 - ((1 - frac) / 0.5 * (1 - self.rate))
-                return (index + frac) * self.interval
-            time_start = _swing_time(key.start)
-            time_end = _swing_time(key.start + key.length)
-            yield key.replace(start=time_start, length=(time_end - time_start))
-
-
-class _AtChannel(Singable):
+    def _swing_time(self, time):
+        index = floor(time / self.interval)
+        frac = (time / self.interval - index)
+        if frac < 0.5:
+            frac = frac / 0.5 * self.rate
+        else:
+            frac = 1 - ((1 - frac) / 0.5 * (1 - self.rate))
+        return (index + frac) * self.interval
+
+    def map(self, start, length, note, channel, velocity):
+        time_start = self._swing_time(start)
+        time_end = self._swing_time(start + length)
+        return time_start, time_end - time_start, note, channel, velocity
+
+    def _swing_times(self, times):
+        index = np.floor(times / self.interval)
+        frac = (times / self.interval - index)
+        frac = np.where(frac < 0.5, frac / 0.5 * self.rate, 1 - ((1 - frac) / 0.5 * (1 - self.rate)))
+        return (index + frac) * self.interval
+
+    def apply(self, buffer):
+        time_start = self._swing_times(buffer.start)
+        time_end = self._swing_times(buffer.start + buffer.length)
+        return buffer.replace(start=time_start, length=time_end - time_start)
+
+
+class _AtChannel(_KeyMap):
     def __init__(self, child, channel):
         self.child = child
         self.channel = channel
 
-    def sing(self):
-        for key in self.child.sing():
-            yield key.replace(channel=self.channel)
+    def map(self, start, length, note, channel, velocity):
+        return start, length, note, channel if self.channel is None else self.channel, velocity
 
+    def apply(self, buffer):
+        if self.channel is None:
+            return buffer
+        return buffer.replace(channel=np.full(len(buffer), self.channel))
 
-class _AtNote(Singable):
+
+class _AtNote(_KeyMap):
     def __init__(self, child, note):
         self.child = child
         self.note = note
 
-    def sing(self):
-        for key in self.child.sing():
-            yield key.replace(note=self.note)
+    def map(self, start, length, note, channel, velocity):
+        return start, length, note if self.note is None else self.note, channel, velocity
+
+    def apply(self, buffer):
+        if self.note is None:
+            return buffer
+        return buffer.replace(
+            step=np.full(len(buffer), self.note.step), midi=np.full(len(buffer), self.note.midi), rest=np.zeros(len(buffer), dtype=bool))
 
 
 class _Arpeggio(Singable):
@@ -271,8 +679,8 @@ class _Arpeggio(Singable):
         self.number_offset = number_offset
 
     def sing(self):
-        key_chord = list(self.chord.sing())
-        for arp_key in self.pattern.sing():
+        key_chord = list(_sing(self.chord))
+        for arp_key in _sing(self.pattern):
             time = arp_key.start
             keys_at_time = [key for key in key_chord if key.start <= time and key.start + key.length > time]
             ind = arp_key.note.midi_number() - self.number_offset
@@ -297,10 +705,10 @@ class _Arpeggio(Singable):
                 channel=arp_key.channel
             )
 
-from .reharmonize import _song_to_chord
+from .reharmonize import _song_to_chord, _song_to_chord_parallel
+from .cache import default_cache
 
-def reharmonize(song, scale, granularity=(1, 2, 4), return_chord=False, restrictions=None):
-    nodes = _song_to_chord(song, scale, granularity=granularity, restrictions=restrictions)
+def _progression(nodes, scale, return_chord):
     progression = []
     for n in nodes:
         c = scale.chord(n.number)
@@ -313,15 +721,54 @@ def reharmonize(song, scale, granularity=(1, 2, 4), return_chord=False, restrict
         return Enumerate()(progression)
 
 
+def reharmonize(song, scale, granularity=(1, 2, 4), return_chord=False, restrictions=None, k=None, cache=default_cache,
+                phrases=None, executor=None):
+    # with k, returns up to k (progression, score) pairs, best first; pass cache=None to always solve.
+    # With phrases, the melody is solved in chunks of that many cadences on a process pool (executor, or
+    # a new pool) and (progression, gap) is returned: the optimum scores at most gap above the result.
+    # Chunked solves are not cached.
+    if phrases is not None:
+        if k is not None:
+            raise ValueError('k best progressions are not available with phrases')
+        nodes, gap = _song_to_chord_parallel(
+            song, scale, granularity=granularity, restrictions=restrictions, phrases=phrases, executor=executor)
+        return _progression(nodes, scale, return_chord), gap
+
+    if k is not None:
+        results = _song_to_chord(song, scale, granularity=granularity, restrictions=restrictions, k=k, cache=cache)
+        return [(_progression(nodes, scale, return_chord), nodes[-1].total_value) for nodes in results]
+
+    nodes = _song_to_chord(song, scale, granularity=granularity, restrictions=restrictions, cache=cache)
+    return _progression(nodes, scale, return_chord)
+
+
 class _Reharmonizer(Singable):
-    def __init__(self, child, scale, restrictions=None, granularity=(2, 4)):
+    # rank selects the rank-th best progression, 0 being the optimum; phrases and executor solve in
+    # chunks as in reharmonize(), without a gap to report
+    def __init__(self, child, scale, restrictions=None, granularity=(2, 4), rank=0, cache=default_cache,
+                 phrases=None, executor=None):
         self.child = child
         self.scale = scale
         self.restrictions = restrictions
         self.granularity = granularity
+        self.rank = rank
+        self.cache = cache
+        self.phrases = phrases
+        self.executor = executor
     
     def sing(self):
-        for key in reharmonize(self.child, self.scale, granularity=self.granularity, restrictions=self.restrictions).sing():
+        if self.phrases is not None:
+            if self.rank:
+                raise ValueError('ranked progressions are not available with phrases')
+            progression, _ = reharmonize(
+                self.child, self.scale, granularity=self.granularity, restrictions=self.restrictions,
+                phrases=self.phrases, executor=self.executor)
+        elif self.rank:
+            results = reharmonize(self.child, self.scale, granularity=self.granularity, restrictions=self.restrictions, k=self.rank + 1, cache=self.cache)
+            progression = results[min(self.rank, len(results) - 1)][0]
+        else:
+            progression = reharmonize(self.child, self.scale, granularity=self.granularity, restrictions=self.restrictions, cache=self.cache)
+        for key in progression.sing():
             yield key
 
     
@@ -345,6 +792,32 @@ Arpeggio = parameter_graphmaker(_Arpeggio)
 Reharmonize = parameter_graphmaker(_Reharmonizer)
 
 
+def _graph_depth(singable):
+    # nesting depth of the graph, measured with an explicit stack
+    depth = {}
+    stack = [(singable, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if id(node) in depth:
+            continue
+        children = [c for c in _child_singables(node) if not isinstance(c, (Key, EventBuffer))]
+        if expanded:
+            depth[id(node)] = 1 + max([depth[id(c)] for c in children], default=0)
+        else:
+            stack.append((node, True))
+            stack.extend((c, False) for c in children if id(c) not in depth)
+    return depth[id(singable)]
+
+
+def _output_buffer(singable):
+    # rendering and fingerprinting recurse a few frames per level of the graph; graphs nested deeper
+    # than that allows are sung instead, which nests about half as many frames per level
+    if _graph_depth(singable) > sys.getrecursionlimit() // 5:
+        return EventBuffer.from_keys(singable.sing())
+    with RenderContext(singable):
+        return render(singable)
+
+
 def to_midi(
     singable, velocity_max=127, tick_per_beat=480, instruments=None,
     initial_bpm=144
@@ -353,31 +826,27 @@ def to_midi(
     track = MidiTrack()
     mid.tracks.append(track)
 
-    messages = []
-    for key in singable.sing():
-        if key.note is None:
-            continue
-
-        channel = key.channel
+    buffer = _output_buffer(singable)
+    buffer = buffer.take(np.flatnonzero(~buffer.rest))
 
-        velocity = int(key.velocity * velocity_max)
-        time_start = int(key.start * tick_per_beat)
-        time_end = int((key.start + key.length) * tick_per_beat)
-        
-        messages.append(Message('note_on', note=key.note.midi_number(), velocity=velocity, time=time_start, channel=channel))
-        messages.append(Message('note_off', note=key.note.midi_number(), velocity=velocity, time=time_end, channel=channel))
+    # note_on and note_off of every key interleaved, then stably sorted by tick like a sorted message list
+    ticks = np.empty(2 * len(buffer), dtype=np.int64)
+    ticks[0::2] = (buffer.start * tick_per_beat).astype(np.int64)
+    ticks[1::2] = ((buffer.start + buffer.length) * tick_per_beat).astype(np.int64)
+    order = np.argsort(ticks, kind='stable')
+    deltas = np.diff(ticks[order], prepend=0)
+    velocities = (buffer.velocity * velocity_max).astype(np.int64)
     
     track.append(MetaMessage('set_tempo', tempo=bpm2tempo(initial_bpm)))
 
     for channel, program in instruments.items():
         track.append(Message('program_change', channel=channel, program=program))
 
-    time_prev = 0
-    messages = sorted(messages, key=lambda x: x.time)
-    for msg in messages:
-        msg_timed = msg.copy(time=msg.time - time_prev)
-        time_prev = msg.time
-        track.append(msg_timed)
+    kinds = ('note_on', 'note_off')
+    midis, channels, velocities = buffer.midi.tolist(), buffer.channel.tolist(), velocities.tolist()
+    for index, delta in zip(order.tolist(), deltas.tolist()):
+        row = index // 2
+        track.append(Message(kinds[index % 2], note=midis[row], velocity=velocities[row], time=delta, channel=channels[row]))
     
     return mid
 
@@ -389,7 +858,8 @@ from .utils import length_notation
 def to_lilypond(singable, chords=None, clefs=None):
     result = defaultdict(list)
     channels = defaultdict(lambda: defaultdict(list))
-    for k in singable.sing():
+    buffer = _output_buffer(singable)
+    for k in buffer.sing():
         channels[k.channel][k.start].append(k)
     
     for channel, keys in channels.items():
@@ -474,3 +944,267 @@ def to_lilypond(singable, chords=None, clefs=None):
 
     return output_to_string(output)
             
+
+
+if __name__ == '__main__':
+    import unittest
+    from .note import MajorScale
+    from .cache import ReharmonizationCache
+
+    class _Counted(Singable):
+        def __init__(self, child):
+            self.child = child
+            self.count = 0
+
+        def sing(self):
+            self.count += 1
+            for key in self.child.sing():
+                yield key
+
+    class _SlottedCounted(Singable):
+        __slots__ = ('child', 'count')
+
+        def __init__(self, child):
+            self.child = child
+            self.count = 0
+
+        def sing(self):
+            self.count += 1
+            return self.child.sing()
+
+    def _fields(keys):
+        return [(k.start, k.length, k.note, k.channel, k.velocity) for k in keys]
+
+    def _order(fields):
+        start, length, note, channel, velocity = fields
+        return start, length, -1 if note is None else note.midi, channel, velocity
+
+    def _sung_midi(singable, instruments, velocity_max=127, tick_per_beat=480, initial_bpm=144):
+        # to_midi as it was before rendering: messages built from sing() and sorted by time
+        import io
+        messages = []
+        for key in singable.sing():
+            if key.note is None:
+                continue
+            velocity = int(key.velocity * velocity_max)
+            for kind, time in (('note_on', key.start), ('note_off', key.start + key.length)):
+                messages.append(Message(kind, note=key.note.midi_number(), velocity=velocity, time=int(time * tick_per_beat), channel=key.channel))
+        mid = MidiFile()
+        track = MidiTrack()
+        mid.tracks.append(track)
+        track.append(MetaMessage('set_tempo', tempo=bpm2tempo(initial_bpm)))
+        for channel, program in instruments.items():
+            track.append(Message('program_change', channel=channel, program=program))
+        time_prev = 0
+        for msg in sorted(messages, key=lambda x: x.time):
+            track.append(msg.copy(time=msg.time - time_prev))
+            time_prev = msg.time
+        f = io.BytesIO()
+        mid.save(file=f)
+        return f.getvalue()
+
+    def _midi(singable, instruments):
+        import io
+        f = io.BytesIO()
+        to_midi(singable, instruments=instruments).save(file=f)
+        return f.getvalue()
+
+    class TestRender(unittest.TestCase):
+
+        def setUp(self):
+            self.melody = Enumerate()([
+                Key(length=length, note=None if note is None else Note(note))
+                for length, note in [(1, 'C5'), (1/2, 'E5'), (1/2, None), (2, 'G5'), (1, 'A4'), (1, 'F5'), (2, 'C5')]
+            ])
+            notes = Enumerate()([Key(length=1, note=Note(n)) for n in ['C5', 'E5', 'G5', 'F5', 'D5', 'B4', 'C5', 'C5']])
+            # SelectInterval.sing() indexes its functions by start // interval, so starts stay whole beats
+            beats = Enumerate()([Key(length=1, note=None if n is None else Note(n)) for n in ['C5', 'E5', None, 'G5', 'A4', 'F5', 'C5']])
+            scale = MajorScale(tonic=Note('C5'))
+            chords = Reharmonize(scale, cache=None)(notes)
+            pattern = Repeat(4)(Enumerate()([Key(length=1/2, note=Note(n)) for n in ['C4', 'C#4', 'C##4', 'C#4']]))
+            self.graphs = [
+                SelectInterval(2, [Amplify(0.5), AtChannel(3), AtNote(Note('D5'))])(Repeat(2)(beats)),
+                # functions reading the key, which can only be applied one key at a time
+                SelectInterval(2, [
+                    lambda k: AtNote(k.note if k.note is None else k.note + Interval('M3'))(k),
+                    lambda k: Amplify(0.25)(k) if k.start >= 3 else Lengthen(2)(k),
+                    lambda k: Parallel()([k, ShiftTime(1/4)(k)]),
+                ], outliers='clip')(ShiftTime(1)(beats)),
+                Parallel()([
+                    AtChannel(1)(Arpeggio()((chords, pattern))),
+                    AtChannel(2)(Bound(Note('C3'), Note('C4'))(chords)),
+                    Harmonize(Interval('M3'))(AtChannel(0)(notes)),
+                ]),
+                Enumerate()([Swing(1, 0.75)(self.melody), [Repeat(2, interval=3)(self.melody), ShiftTime(1)(self.melody)]]),
+            ]
+
+        def test_render_matches_sing(self):
+            for graph in self.graphs:
+                expected = _fields(graph.sing())
+                self.assertEqual(_fields(render(graph).sing()), expected)
+                with RenderContext(graph):
+                    self.assertEqual(_fields(render(graph).sing()), expected)
+
+        def test_outputs_match_sing(self):
+            instruments = { 0: 0, 1: 0, 2: 0, 3: 0 }
+            for graph in self.graphs:
+                self.assertEqual(sorted(_fields(render(graph).sing()), key=_order), sorted(_fields(graph.sing()), key=_order))
+                self.assertEqual(_midi(graph, instruments), _sung_midi(graph, instruments))
+                self.assertEqual(to_lilypond(graph), to_lilypond(EventBuffer.from_keys(graph.sing())))
+
+        def test_deep_graph(self):
+            # deeper than render() and the context walk can recurse, but not than sing()
+            nests = [(600, 601, lambda g: Parallel()([g])), (400, 401, lambda g: Enumerate()([g])), (300, 601, lambda g: Amplify(1)(Parallel()([g])))]
+            for count, depth, nest in nests:
+                graph = self.melody
+                for _ in range(count):
+                    graph = nest(graph)
+                self.assertEqual(_graph_depth(graph), depth)
+                self.assertEqual(_midi(graph, { 0: 0 }), _sung_midi(graph, { 0: 0 }))
+                self.assertIn('\\new', to_lilypond(graph))
+
+    class TestReharmonize(unittest.TestCase):
+
+        def test_phrases(self):
+            import random
+            from concurrent.futures import ProcessPoolExecutor
+            rnd = random.Random(5)
+            song = Enumerate()([
+                Key(length=rnd.choice([1/2, 1, 1, 2]), note=rnd.choice([None, Note('C5'), Note('D5'), Note('E5'), Note('G4'), Note('A4')]))
+                for _ in range(160)
+            ])
+            scale = MajorScale(tonic=Note('C5'))
+            end = max(k.start + k.length for k in song.sing())
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                (progression, chords), gap = reharmonize(song, scale, return_chord=True, phrases=1, executor=pool)
+                node = Reharmonize(scale, granularity=(1, 2, 4), phrases=1, executor=pool)(song)
+                self.assertEqual(_fields(node.sing()), _fields(progression.sing()))
+            self.assertGreaterEqual(gap, 0)
+            self.assertEqual(sum(length for _, length in chords), int(end))
+            self.assertEqual(max(k.start + k.length for k in progression.sing()), int(end))
+
+            # one chunk covering the whole melody is the single-dag solve
+            progression, gap = reharmonize(song, scale, phrases=8, cache=None)
+            self.assertEqual(gap, 0)
+            self.assertEqual(_fields(progression.sing()), _fields(reharmonize(song, scale, cache=None).sing()))
+            with self.assertRaises(ValueError):
+                reharmonize(song, scale, phrases=1, k=2)
+
+    class TestKeyMapChain(unittest.TestCase):
+
+        def setUp(self):
+            self.melody = Enumerate()([Key(length=n % 3 / 2 + 1/2, note=Note(['C5', 'D5', 'E5', 'F#5', 'G5', 'A5', 'Bb5'][n % 7])) for n in range(24)])
+            self.chain = Bound(Note('C4'), Note('B5'))(Swing(1, 0.6)(Transpose(Interval('m3'))(
+                AtChannel(2)(Amplify(0.5)(ShiftTime(1/4)(self.melody))))))
+
+        def _unfused(self, node):
+            # every operator sung on its own, one intermediate Key per operator
+            if not isinstance(node, _KeyMap):
+                return list(node.sing())
+            return [Key(*node.map(*k)) for k in self._unfused(node.child)]
+
+        def test_key_slots(self):
+            self.assertFalse(hasattr(Key(), '__dict__'))
+
+        def test_chain(self):
+            source, nodes = self.chain.chain()
+            self.assertIs(source, self.melody)
+            self.assertEqual([type(n) for n in nodes], [_ShiftTime, _Amplify, _AtChannel, _Transpose, _Swing, _Bound])
+
+        def test_fused_matches_unfused(self):
+            expected = _fields(self._unfused(self.chain))
+            self.assertEqual(_fields(self.chain.sing()), expected)
+            self.assertEqual(_fields(render(self.chain).sing()), expected)
+            lengthened = Longify(1/4)(Lengthen(2)(self.chain))
+            self.assertEqual(_fields(lengthened.sing()), _fields(self._unfused(lengthened)))
+
+    class TestRenderContext(unittest.TestCase):
+
+        def setUp(self):
+            self.melody = Enumerate()([Key(length=1, note=Note(n)) for n in ['C5', 'E5', 'G5', 'F5', 'D5', 'B4', 'C5', 'C5']])
+
+        def test_shared_node(self):
+            # one reharmonized progression feeding both the arpeggio and the bass line, as in main.py
+            scale = MajorScale(tonic=Note('C5'))
+            chords = _Counted(Reharmonize(scale, cache=None)(self.melody))
+            pattern = Repeat(4)(Enumerate()([Key(length=1/2, note=Note(n)) for n in ['C4', 'C#4', 'C##4', 'C#4']]))
+            song = Parallel()([
+                AtChannel(1)(Arpeggio()((chords, pattern))),
+                AtChannel(2)(Transpose(Interval('-P15'))(chords)),
+                Harmonize(Interval('M3'))(AtChannel(0)(self.melody)),
+            ])
+            expected = _fields(song.sing())
+            self.assertEqual(chords.count, 2)
+
+            chords.count = 0
+            with RenderContext(song) as context:
+                self.assertEqual(_fields(song.sing()), expected)
+            self.assertEqual(chords.count, 1)
+            self.assertGreaterEqual(context.hits, 2)
+
+            chords.count = 0
+            with RenderContext(song):
+                self.assertEqual(_fields(render(song).sing()), expected)
+            self.assertEqual(chords.count, 1)
+
+        def test_structural_sharing(self):
+            a = _Counted(Transpose(Interval('M3'))(self.melody))
+            b = _Counted(Transpose(Interval('M3'))(Enumerate()([Key(length=1, note=k.note) for k in self.melody.children])))
+            c = _Counted(Transpose(Interval('d4'))(self.melody))
+            song = Parallel()([a, b, c])
+            expected = _fields(song.sing())
+            with RenderContext(song):
+                self.assertEqual(_fields(song.sing()), expected)
+            # a and b are equal, c is enharmonically equal but spelled differently
+            self.assertEqual((a.count, b.count, c.count), (2, 1, 2))
+
+        def test_eviction(self):
+            shared = Repeat(4)(self.melody)
+            other = Repeat(2)(AtChannel(1)(self.melody))
+            song = Parallel()([shared, shared, other, other, shared])
+            expected = _fields(song.sing())
+            with RenderContext(song, max_events=40) as context:
+                self.assertEqual(_fields(song.sing()), expected)
+            self.assertLessEqual(context.size, 40)
+            self.assertGreater(context.evictions, 0)
+
+        def test_shared_chain(self):
+            src = _Counted(self.melody)
+            shared = Transpose(Interval('M2'))(AtChannel(1)(Amplify(0.8)(src)))
+            song = Parallel()([shared, Amplify(0.5)(shared)])
+            expected = _fields(song.sing())
+            src.count = 0
+            with RenderContext(song) as context:
+                self.assertEqual(_fields(song.sing()), expected)
+                self.assertEqual(_fields(render(song).sing()), expected)
+            self.assertEqual(src.count, 1)
+            self.assertEqual((context.misses, context.info()['shared']), (1, 1))
+            self.assertEqual(context.hits, 3)
+
+        def test_slotted_singable(self):
+            import io
+            node = _SlottedCounted(self.melody)
+            song = Parallel()([node, AtChannel(1)(node)])
+            expected = EventBuffer.from_keys(song.sing())
+            self.assertEqual(node.count, 2)
+            data = []
+            for singable in (song, expected):
+                f = io.BytesIO()
+                to_midi(singable, instruments={ 0: 0, 1: 0 }).save(file=f)
+                data.append(f.getvalue())
+            self.assertEqual(data[0], data[1])
+            # structurally equal to itself through its slots, so it is still shared
+            self.assertEqual(node.count, 3)
+
+        def test_threads(self):
+            from concurrent.futures import ThreadPoolExecutor
+            src = _Counted(self.melody)
+            song = Parallel()([src, src])
+            with RenderContext(song):
+                with ThreadPoolExecutor(max_workers=1) as pool:
+                    pool.submit(lambda: list(song.sing())).result()
+                self.assertEqual(src.count, 2)
+                list(song.sing())
+            self.assertEqual(src.count, 3)
+
+    unittest.main()